@@ -97,59 +97,52 @@ namespace pimoroni {
 
 static ST7701* st7701_inst;
 
-// This ISR is triggered whenever the timing SM's FIFO is not full
-void __isr __no_inline_not_in_flash_func(timing_isr)() {
-    st7701_inst->drive_timing();
-}
-
-void __not_in_flash_func(ST7701::drive_timing)()
+// Scratch space for update_converted, kept off the stack since updates can run on core1
+static uint16_t convert_lut[256];
+static uint32_t convert_pair_lut[256];
+static uint8_t __attribute__((aligned(4))) convert_row[TIMING_H_DISPLAY];
+
+// The timing SM's instruction for one phase of a row of the frame.
+// The whole frame is generated up front and fed to the SM by DMA.
+static uint32_t timing_instr(uint row, uint phase)
 {
-    while (!pio_sm_is_tx_fifo_full(st_pio, timing_sm)) {
-        uint32_t instr;
-        switch (timing_phase) {
-            case 0:
-                // Front Porch
-                instr = 0x4000B042u;  // HSYNC high, NOP
-                if (timing_row >= TIMING_V_PULSE) instr |= 0x80000000u;  // VSYNC high if not in VSYNC pulse
-                instr |= (TIMING_H_FRONT - 3) << 16;
-                pio_sm_put(st_pio, timing_sm, instr);
-                break;
-
-            case 1:
-                // HSYNC
-                instr = 0x0000B042u;  // HSYNC low, NOP
-                if (timing_row >= TIMING_V_PULSE) instr |= 0x80000000u;  // VSYNC high if not in VSYNC pulse
-                instr |= (TIMING_H_PULSE - 3) << 16;
-                pio_sm_put(st_pio, timing_sm, instr);
-                break;
-
-            case 2:
-                // Back Porch, trigger pixel channels if in display window
-                instr = 0x40000000u;  // HSYNC high
-                if (timing_row >= TIMING_V_PULSE) instr |= 0x80000000u;  // VSYNC high if not in VSYNC pulse
-                if (timing_row >= TIMING_V_BACK && timing_row < TIMING_V_DISPLAY) instr |= 0xD004u;  // IRQ 4, triggers the data SM
-                else instr |= 0xB042u;  // NOP
-                instr |= (TIMING_H_BACK - 3) << 16;
-                pio_sm_put(st_pio, timing_sm, instr);
-                //printf(".\n");
-                break;
-
-            case 3:
-                // Display, trigger next frame at frame end
-                instr = 0x40000000u;  // HSYNC high
-                if (timing_row == TIMING_V_DISPLAY) instr |= 0xD001u;  // irq 1, to trigger queueing DMA for a new frame 
-                else if (timing_row >= TIMING_V_BACK - 1 && timing_row < TIMING_V_DISPLAY) instr |= 0xD000u;  // irq 0, to trigger queueing DMA for a new line 
-                else instr |= 0xB042u;  // NOP
-                if (timing_row >= TIMING_V_PULSE) instr |= 0x80000000u;  // VSYNC high if not in VSYNC pulse
-                instr |= (TIMING_H_DISPLAY - 3) << 16;
-                pio_sm_put(st_pio, timing_sm, instr);
-
-                if (++timing_row >= TIMING_V_FRONT) timing_row = 0;
-                break;
-        }
-
-        timing_phase = (timing_phase + 1) & 3;
+    uint32_t instr;
+    switch (phase) {
+        case 0:
+        default:
+            // Front Porch
+            instr = 0x4000B042u;  // HSYNC high, NOP
+            if (row >= TIMING_V_PULSE) instr |= 0x80000000u;  // VSYNC high if not in VSYNC pulse
+            instr |= (TIMING_H_FRONT - 3) << 16;
+            break;
+
+        case 1:
+            // HSYNC
+            instr = 0x0000B042u;  // HSYNC low, NOP
+            if (row >= TIMING_V_PULSE) instr |= 0x80000000u;  // VSYNC high if not in VSYNC pulse
+            instr |= (TIMING_H_PULSE - 3) << 16;
+            break;
+
+        case 2:
+            // Back Porch, trigger pixel channels if in display window
+            instr = 0x40000000u;  // HSYNC high
+            if (row >= TIMING_V_PULSE) instr |= 0x80000000u;  // VSYNC high if not in VSYNC pulse
+            if (row >= TIMING_V_BACK && row < TIMING_V_DISPLAY) instr |= 0xD004u;  // IRQ 4, triggers the data SM
+            else instr |= 0xB042u;  // NOP
+            instr |= (TIMING_H_BACK - 3) << 16;
+            break;
+
+        case 3:
+            // Display, trigger next frame at frame end
+            instr = 0x40000000u;  // HSYNC high
+            if (row == TIMING_V_DISPLAY) instr |= 0xD001u;  // irq 1, to trigger queueing DMA for a new frame 
+            else if (row >= TIMING_V_BACK - 1 && row < TIMING_V_DISPLAY) instr |= 0xD000u;  // irq 0, to trigger queueing DMA for a new line 
+            else instr |= 0xB042u;  // NOP
+            if (row >= TIMING_V_PULSE) instr |= 0x80000000u;  // VSYNC high if not in VSYNC pulse
+            instr |= (TIMING_H_DISPLAY - 3) << 16;
+            break;
     }
+    return instr;
 }
 
 // This ISR is triggered at the end of each line transferred
@@ -168,9 +161,18 @@ void __not_in_flash_func(ST7701::start_line_xfer)()
     hw_clear_bits(&st_pio->irq, 0x1);
 
     ++display_row;
-    if (display_row == DISPLAY_HEIGHT) next_line_addr = 0;
-    else if (palette) next_line_addr = &framebuffer[(width >> 1) * (display_row >> row_shift)];
-    else next_line_addr = &framebuffer[width * (display_row >> row_shift)];
+    if (display_row >= DISPLAY_HEIGHT) next_line_addr = 0;
+    else {
+      int row;
+      if (line_table) row = line_table[display_row];
+      else {
+        // Scrolling wraps around the framebuffer, so it can be used as a ring buffer
+        row = display_row / row_scale + scroll;
+        if (row >= height) row -= height;
+      }
+      if (palette) next_line_addr = &framebuffer[(width >> 1) * row];
+      else next_line_addr = &framebuffer[width * row];
+    }
 }
 
 void __not_in_flash_func(ST7701::start_frame_xfer)()
@@ -181,6 +183,12 @@ void __not_in_flash_func(ST7701::start_frame_xfer)()
         framebuffer = next_framebuffer;
         next_framebuffer = nullptr;
     }
+    scroll = next_scroll;
+    ++stats.frames;
+    if (line_table_pending) {
+        line_table = next_line_table;
+        line_table_pending = false;
+    }
 
     next_line_addr = 0;
     dma_channel_abort(st_dma);
@@ -192,8 +200,8 @@ void __not_in_flash_func(ST7701::start_frame_xfer)()
     pio_sm_exec_wait_blocking(st_pio, parallel_sm, pio_encode_jmp(parallel_offset));
     pio_sm_set_enabled(st_pio, parallel_sm, true);
     display_row = 0;
-    next_line_addr = framebuffer;
-    dma_channel_set_read_addr(st_dma, framebuffer, true);  
+    next_line_addr = &framebuffer[(palette ? (width >> 1) : width) * (line_table ? line_table[0] : scroll)];
+    dma_channel_set_read_addr(st_dma, next_line_addr, true);
 
     waiting_for_vsync = false;
     __sev();
@@ -211,29 +219,29 @@ void __not_in_flash_func(ST7701::start_frame_xfer)()
       st7701_inst = this;
   }
 
+  uint32_t ST7701::get_clk_div() const {
+      // Determine clock divider
+      uint32_t max_pio_clk = 34 * MHZ;
+      const uint32_t sys_clk_hz = clock_get_hz(clk_sys);
+      uint32_t clk_div = (sys_clk_hz + max_pio_clk - 1) / max_pio_clk;
+      if (palette && width == 480) {
+        // Minimum clock divisor of 8 to ensure there is time for the palette decode
+        if (clk_div < 8) clk_div = 8;
+      }
+
+      if ((TIMING_H_DISPLAY / width) & 1) {
+        // The parallel output SM's divider is clk_div * scale / 2, which must be a whole number
+        if (clk_div & 1) clk_div += 1;
+      }
+      return clk_div;
+  }
+
   void ST7701::init() {
-      irq_handler_t current = nullptr;
-  
       st_pio = pio1;
-      parallel_sm = pio_claim_unused_sm(st_pio, true);
 
       timing_sm = pio_claim_unused_sm(st_pio, true);
       timing_offset = pio_add_program(st_pio, &st7701_timing_program);
 
-
-      if (palette) {
-        parallel_offset = pio_add_program(st_pio, &st7701_parallel_18bpp_program);
-
-        palette_sm = pio_claim_unused_sm(st_pio, true);
-        palette_offset = pio_add_program(st_pio, &st7701_palette_program);
-      }
-      else {
-        parallel_offset = pio_add_program(st_pio, &st7701_parallel_program);
-      }
-
-      row_shift = 0;
-      if (height == 240) row_shift = 1;
-
       spi_init(spi, SPI_BAUD);
       gpio_set_function(spi_cs, GPIO_FUNC_SIO);
       gpio_set_dir(spi_cs, GPIO_OUT);
@@ -254,6 +262,101 @@ void __not_in_flash_func(ST7701::start_frame_xfer)()
       pio_gpio_init(st_pio, lcd_de);
       pio_gpio_init(st_pio, lcd_dot_clk);
 
+      pio_sm_set_consecutive_pindirs(st_pio, timing_sm, hsync, 4, true);
+
+      pio_sm_config c = st7701_timing_program_get_default_config(timing_offset);
+
+      sm_config_set_out_pins(&c, hsync, 2);
+      sm_config_set_sideset_pins(&c, lcd_dot_clk);
+      sm_config_set_fifo_join(&c, PIO_FIFO_JOIN_TX);
+      sm_config_set_out_shift(&c, false, true, 32);
+      sm_config_set_clkdiv(&c, get_clk_div());
+      
+      pio_sm_init(st_pio, timing_sm, timing_offset, &c);
+      pio_sm_set_enabled(st_pio, timing_sm, true);
+
+      printf("Begin SPI setup\n");
+
+      common_init();
+
+      printf("Setup screen timing\n");
+
+      // Setup timing, the same sequence of instructions is sent to the timing SM
+      // every frame, so build it once and have DMA feed it round in a loop.
+      static_assert(TIMING_V_FRONT * 4 == TIMING_TABLE_SIZE, "Timing table doesn't match the frame timing");
+      for (uint row = 0; row < TIMING_V_FRONT; ++row) {
+        for (uint phase = 0; phase < 4; ++phase) {
+          timing_table[row * 4 + phase] = timing_instr(row, phase);
+        }
+      }
+      timing_table_addr = timing_table;
+
+      timing_dma = dma_claim_unused_channel(true);
+      timing_dma2 = dma_claim_unused_channel(true);
+
+      dma_channel_config config = dma_channel_get_default_config(timing_dma);
+      channel_config_set_transfer_data_size(&config, DMA_SIZE_32);
+      channel_config_set_dreq(&config, pio_get_dreq(st_pio, timing_sm, true));
+      channel_config_set_chain_to(&config, timing_dma2);
+      dma_channel_configure(timing_dma, &config, &st_pio->txf[timing_sm], nullptr, TIMING_TABLE_SIZE, false);
+
+      // Restart the timing channel from the top of the table once it has sent the whole frame
+      config = dma_channel_get_default_config(timing_dma2);
+      channel_config_set_transfer_data_size(&config, DMA_SIZE_32);
+      channel_config_set_read_increment(&config, false);
+      dma_channel_configure(timing_dma2, &config, &dma_hw->ch[timing_dma].al3_read_addr_trig, &timing_table_addr, 1, true);
+
+      init_pixels();
+
+      if(lcd_bl != PIN_UNUSED) {
+        // Wait for a whole frame to be sent to clear any previous content,
+        // then turn the backlight on now surprises have passed.
+        wait_for_vsync();
+        wait_for_vsync();
+        set_backlight(255);
+      }
+    }
+
+  bool ST7701::is_running() const {
+    return timing_dma >= 0 && dma_channel_is_claimed(timing_dma) &&
+           pio_sm_is_claimed(st_pio, timing_sm) && (st_pio->ctrl & (1u << timing_sm));
+  }
+
+  void ST7701::set_layout(uint16_t width, uint16_t height, uint16_t* framebuffer, uint32_t* palette) {
+    this->width = width;
+    this->height = height;
+    this->framebuffer = framebuffer;
+    this->palette = palette;
+
+    // Anything set up for the previous layout no longer applies
+    next_framebuffer = nullptr;
+    for (auto &locked : palette_locked) locked = 0;
+    scroll = next_scroll = 0;
+    line_table = next_line_table = nullptr;
+    line_table_pending = false;
+    damage_tracking = damage_valid = false;
+    for (auto &config : layer_config) config = LayerConfig();
+    reset_stats();
+  }
+
+  void ST7701::init_pixels() {
+      irq_handler_t current = nullptr;
+
+      parallel_sm = pio_claim_unused_sm(st_pio, true);
+
+      if (palette) {
+        parallel_offset = pio_add_program(st_pio, &st7701_parallel_18bpp_program);
+
+        palette_sm = pio_claim_unused_sm(st_pio, true);
+        palette_offset = pio_add_program(st_pio, &st7701_palette_program);
+      }
+      else {
+        parallel_offset = pio_add_program(st_pio, &st7701_parallel_program);
+      }
+
+      // Each frame buffer row is repeated for this many lines of the panel
+      row_scale = DISPLAY_HEIGHT / height;
+
       const uint num_data_pins = palette ? 18 : 16;
 
       for(auto i = 0u; i < num_data_pins; i++) {
@@ -269,7 +372,6 @@ void __not_in_flash_func(ST7701::start_frame_xfer)()
       }
 
       pio_sm_set_consecutive_pindirs(st_pio, parallel_sm, d0, num_data_pins, true);
-      pio_sm_set_consecutive_pindirs(st_pio, parallel_sm, hsync, 4, true);
       
       pio_sm_config c = palette ? st7701_parallel_18bpp_program_get_default_config(parallel_offset) :
           st7701_parallel_program_get_default_config(parallel_offset);
@@ -279,42 +381,20 @@ void __not_in_flash_func(ST7701::start_frame_xfer)()
       sm_config_set_fifo_join(&c, PIO_FIFO_JOIN_TX);
       sm_config_set_out_shift(&c, true, true, 32);
       sm_config_set_in_shift(&c, false, false, 32);
-      
-      // Determine clock divider
-      uint32_t max_pio_clk = 34 * MHZ;
-      const uint32_t sys_clk_hz = clock_get_hz(clk_sys);
-      uint32_t clk_div = (sys_clk_hz + max_pio_clk - 1) / max_pio_clk;
-      if (palette && width == 480) {
-        // Minimum clock divisor of 8 to ensure there is time for the palette decode
-        if (clk_div < 8) clk_div = 8;
-      }
-      
-      if (width == 480) {
-        // Parallel output SM must run at double the rate of the timing SM for full res
-        if (clk_div & 1) clk_div += 1;
-        sm_config_set_clkdiv(&c, clk_div >> 1);
-      }
-      else
-      {
-        sm_config_set_clkdiv(&c, clk_div);
-      }
+
+      // The timing SM keeps running between layouts, but full res palette mode needs it slower
+      const uint32_t clk_div = get_clk_div();
+      pio_sm_set_clkdiv(st_pio, timing_sm, clk_div);
+
+      // The parallel output SM sends a pixel every 4 cycles and the timing SM clocks one
+      // every 2, so divide its clock by a further scale / 2 to repeat each pixel scale times
+      sm_config_set_clkdiv(&c, (clk_div * (TIMING_H_DISPLAY / width)) >> 1);
 
       pio_sm_init(st_pio, parallel_sm, parallel_offset, &c);
       pio_sm_exec(st_pio, parallel_sm, pio_encode_out(pio_y, 32));
       pio_sm_put(st_pio, parallel_sm, (width >> 1) - 1);
       pio_sm_set_enabled(st_pio, parallel_sm, true);
 
-      c = st7701_timing_program_get_default_config(timing_offset);
-
-      sm_config_set_out_pins(&c, hsync, 2);
-      sm_config_set_sideset_pins(&c, lcd_dot_clk);
-      sm_config_set_fifo_join(&c, PIO_FIFO_JOIN_TX);
-      sm_config_set_out_shift(&c, false, true, 32);
-      sm_config_set_clkdiv(&c, clk_div);
-      
-      pio_sm_init(st_pio, timing_sm, timing_offset, &c);
-      pio_sm_set_enabled(st_pio, timing_sm, true);
-
       if (palette) {
         c = st7701_palette_program_get_default_config(palette_offset);
         sm_config_set_out_shift(&c, false, true, 32);
@@ -373,20 +453,10 @@ void __not_in_flash_func(ST7701::start_frame_xfer)()
         dma_channel_configure(st_dma4, &config, &dma_hw->ch[st_dma3].al3_read_addr_trig, &st_pio->rxf[palette_sm], 1, true);
       }
 
-      printf("Begin SPI setup\n");
-
-      common_init();
-
-      printf("Setup screen timing\n");
-
-      // Setup timing
-      hw_set_bits(&st_pio->inte1, 0x010 << timing_sm);  // TX not full
-      // Remove the MicroPython handler if it's set
-      current = irq_get_exclusive_handler(pio_get_irq_num(st_pio, 1));
-      if(current) irq_remove_handler(pio_get_irq_num(st_pio, 1), current);
-      irq_set_exclusive_handler(pio_get_irq_num(st_pio, 1), timing_isr);
-      irq_set_priority(pio_get_irq_num(st_pio, 1), 0x40);
-      irq_set_enabled(pio_get_irq_num(st_pio, 1), true);
+      // The timing SM may already be part way through a frame, so ignore any lines
+      // until the next frame starts.
+      display_row = DISPLAY_HEIGHT;
+      hw_set_bits(&st_pio->irq, 0x3);
 
       hw_set_bits(&st_pio->inte0, 0x300); // IRQ 0
       // Remove the MicroPython handler if it's set
@@ -395,7 +465,66 @@ void __not_in_flash_func(ST7701::start_frame_xfer)()
       irq_set_exclusive_handler(pio_get_irq_num(st_pio, 0), end_of_line_isr);
       irq_set_priority(pio_get_irq_num(st_pio, 0), 0x40);
       irq_set_enabled(pio_get_irq_num(st_pio, 0), true);
-    }
+
+      pixels_running = true;
+  }
+
+  // Panel registers written after reset, each entry is the command, the number
+  // of data bytes, and then the data.
+  static const uint8_t init_sequence[] = {
+    // Commmand 2 BK0 - kinda a page select
+    reg::CND2BKxSEL, 5, 0x77, 0x01, 0x00, 0x00, 0x10,
+
+    // TODO: Figure out what's actually display specific
+    reg::MADCTL, 1, 0x00,        // Normal scan direction and RGB pixels
+    reg::LNESET, 2, 0x3b, 0x00,  // (59 + 1) * 8 = 480 lines
+    reg::PORCTRL, 2, 0x0d, 0x02, // Display porch settings: 13 VBP, 2 VFP (these should not be changed)
+    reg::INVSET, 2, 0x31, 0x01,
+    reg::COLCTRL, 1, 0x08,       // LED polarity reversed
+    reg::PVGAMCTRL, 16, 0x00, 0x11, 0x18, 0x0e, 0x11, 0x06, 0x07, 0x08, 0x07, 0x22, 0x04, 0x12, 0x0f, 0xaa, 0x31, 0x18,
+    reg::NVGAMCTRL, 16, 0x00, 0x11, 0x19, 0x0e, 0x12, 0x07, 0x08, 0x08, 0x08, 0x22, 0x04, 0x11, 0x11, 0xa9, 0x32, 0x18,
+    reg::RGBCTRL, 3, 0x80, 0x2e, 0x0e,  // HV mode, H and V back porch + sync
+
+    // Command 2 BK1 - Voltages and power and stuff
+    reg::CND2BKxSEL, 5, 0x77, 0x01, 0x00, 0x00, 0x11,
+    reg::VHRS, 1, 0x60,    // 4.7375v
+    reg::VCOMS, 1, 0x32,   // 0.725v
+    reg::VGHSS, 1, 0x07,   // 15v
+    reg::TESTCMD, 1, 0x80, // y tho?
+    reg::VGLS, 1, 0x49,    // -10.17v
+    reg::PWCTRL1, 1, 0x85, // Middle/Min/Min bias
+    reg::PWCTRL2, 1, 0x21, // 6.6 / -4.6
+    reg::PDR1, 1, 0x78,    // 1.6uS
+    reg::PDR2, 1, 0x78,    // 6.4uS
+
+    // Begin Forbidden Knowledge
+    // This sequence is probably specific to TL040WVS03CT15-H1263A.
+    // It is not documented in the ST7701s datasheet.
+    // TODO: 👇 W H A T ! ? 👇
+    0xE0, 3, 0x00, 0x1b, 0x02,
+    0xE1, 11, 0x08, 0xa0, 0x00, 0x00, 0x07, 0xa0, 0x00, 0x00, 0x00, 0x44, 0x44,
+    0xE2, 12, 0x11, 0x11, 0x44, 0x44, 0xed, 0xa0, 0x00, 0x00, 0xec, 0xa0, 0x00, 0x00,
+    0xE3, 4, 0x00, 0x00, 0x11, 0x11,
+    0xE4, 2, 0x44, 0x44,
+    0xE5, 16, 0x0a, 0xe9, 0xd8, 0xa0, 0x0c, 0xeb, 0xd8, 0xa0, 0x0e, 0xed, 0xd8, 0xa0, 0x10, 0xef, 0xd8, 0xa0,
+    0xE6, 4, 0x00, 0x00, 0x11, 0x11,
+    0xE7, 2, 0x44, 0x44,
+    0xE8, 16, 0x09, 0xe8, 0xd8, 0xa0, 0x0b, 0xea, 0xd8, 0xa0, 0x0d, 0xec, 0xd8, 0xa0, 0x0f, 0xee, 0xd8, 0xa0,
+    0xEB, 7, 0x02, 0x00, 0xe4, 0xe4, 0x88, 0x00, 0x40,
+    0xEC, 2, 0x3c, 0x00,
+    0xED, 16, 0xab, 0x89, 0x76, 0x54, 0x02, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0x20, 0x45, 0x67, 0x98, 0xba,
+    0x36, 1, 0x00,
+
+    // Command 2 BK3
+    reg::CND2BKxSEL, 5, 0x77, 0x01, 0x00, 0x00, 0x13,
+    0xE5, 1, 0xe4,
+    // End Forbidden Knowledge
+
+    reg::CND2BKxSEL, 5, 0x77, 0x01, 0x00, 0x00, 0x00,
+    //reg::COLMOD, 1, 0x77,  // 24 bits per pixel...
+    reg::COLMOD, 1, 0x66,    // 18 bits per pixel...
+    //reg::COLMOD, 1, 0x55,  // 16 bits per pixel...
+  };
 
   void ST7701::common_init() {
     // if a backlight pin is provided then set it up for
@@ -409,91 +538,38 @@ void __not_in_flash_func(ST7701::start_frame_xfer)()
     }
 
     command(reg::SWRESET);
+    const absolute_time_t reset_time = get_absolute_time();
 
-    sleep_ms(150);
-
-    // Commmand 2 BK0 - kinda a page select
-    command(reg::CND2BKxSEL, 5, "\x77\x01\x00\x00\x10");
+    // The registers can be written 5ms after a reset, but sleep out must wait for 120ms,
+    // so the rest of the setup is done in the meantime rather than waiting up front.
+    sleep_ms(5);
 
-    /*if(width == 480 && height == 480)*/ {
-      // TODO: Figure out what's actually display specific
-      command(reg::MADCTL, 1, "\x00");  // Normal scan direction and RGB pixels
-      command(reg::LNESET, 2, "\x3b\x00");   // (59 + 1) * 8 = 480 lines
-      command(reg::PORCTRL, 2, "\x0d\x02");  // Display porch settings: 13 VBP, 2 VFP (these should not be changed)
-      command(reg::INVSET, 2, "\x31\x01");
-      command(reg::COLCTRL, 1, "\x08");      // LED polarity reversed
-      command(reg::PVGAMCTRL, 16, "\x00\x11\x18\x0e\x11\x06\x07\x08\x07\x22\x04\x12\x0f\xaa\x31\x18");
-      command(reg::NVGAMCTRL, 16, "\x00\x11\x19\x0e\x12\x07\x08\x08\x08\x22\x04\x11\x11\xa9\x32\x18");
-      command(reg::RGBCTRL, 3, "\x80\x2e\x0e");  // HV mode, H and V back porch + sync
+    for (size_t i = 0; i < sizeof(init_sequence); i += 2 + init_sequence[i + 1]) {
+      const uint8_t len = init_sequence[i + 1];
+      command(init_sequence[i], len, len ? (const char*)&init_sequence[i + 2] : nullptr);
     }
 
-    // Command 2 BK1 - Voltages and power and stuff
-    command(reg::CND2BKxSEL, 5, "\x77\x01\x00\x00\x11");
-    command(reg::VHRS, 1, "\x60");    // 4.7375v
-    command(reg::VCOMS, 1, "\x32");   // 0.725v
-    command(reg::VGHSS, 1, "\x07");   // 15v
-    command(reg::TESTCMD, 1, "\x80"); // y tho?
-    command(reg::VGLS, 1, "\x49");    // -10.17v
-    command(reg::PWCTRL1, 1, "\x85"); // Middle/Min/Min bias
-    command(reg::PWCTRL2, 1, "\x21"); // 6.6 / -4.6
-    command(reg::PDR1, 1, "\x78");    // 1.6uS
-    command(reg::PDR2, 1, "\x78");    // 6.4uS
-
-    // Begin Forbidden Knowledge
-    // This sequence is probably specific to TL040WVS03CT15-H1263A.
-    // It is not documented in the ST7701s datasheet.
-    // TODO: 👇 W H A T ! ? 👇
-    command(0xE0, 3, "\x00\x1b\x02");
-    command(0xE1, 11, "\x08\xa0\x00\x00\x07\xa0\x00\x00\x00\x44\x44");
-    command(0xE2, 12, "\x11\x11\x44\x44\xed\xa0\x00\x00\xec\xa0\x00\x00");
-    command(0xE3, 4, "\x00\x00\x11\x11");
-    command(0xE4, 2, "\x44\x44");
-    command(0xE5, 16, "\x0a\xe9\xd8\xa0\x0c\xeb\xd8\xa0\x0e\xed\xd8\xa0\x10\xef\xd8\xa0");
-    command(0xE6, 4, "\x00\x00\x11\x11");
-    command(0xE7, 2, "\x44\x44");
-    command(0xE8, 16, "\x09\xe8\xd8\xa0\x0b\xea\xd8\xa0\x0d\xec\xd8\xa0\x0f\xee\xd8\xa0");
-    command(0xEB, 7, "\x02\x00\xe4\xe4\x88\x00\x40");
-    command(0xEC, 2, "\x3c\x00");
-    command(0xED, 16, "\xab\x89\x76\x54\x02\xff\xff\xff\xff\xff\xff\x20\x45\x67\x98\xba");
-    command(0x36, 1, "\x00");
-
-    // Command 2 BK3
-    command(reg::CND2BKxSEL, 5, "\x77\x01\x00\x00\x13");
-    command(0xE5, 1, "\xe4");
-    // End Forbidden Knowledge
-
-    command(reg::CND2BKxSEL, 5, "\x77\x01\x00\x00\x00");
-    //command(reg::COLMOD, 1, "\x77");  // 24 bits per pixel...
-    command(reg::COLMOD, 1, "\x66");    // 18 bits per pixel...
-    //command(reg::COLMOD, 1, "\x55");  // 16 bits per pixel...
-    
     command(reg::INVON);
     sleep_ms(1);
+    sleep_until(delayed_by_ms(reset_time, 120));
     command(reg::SLPOUT);
     sleep_ms(120);
     command(reg::DISPON);
-    sleep_ms(50);
 
     // TODO: Support rotation
     // configure_display(rotation);
 
-    if(lcd_bl != PIN_UNUSED) {
-      //update(); // Send the new buffer to the display to clear any previous content
-      sleep_ms(50); // Wait for the update to apply
-      set_backlight(255); // Turn backlight on now surprises have passed
-    }
+    // The backlight is turned on by init() once the first frame has been sent
   }
 
-  void ST7701::cleanup() {
+  void ST7701::cleanup_pixels() {
+    if (!pixels_running) return;
+
     irq_handler_t current;
 
     irq_set_enabled(pio_get_irq_num(st_pio, 0), false);
     current = irq_get_exclusive_handler(pio_get_irq_num(st_pio, 0));
     if(current) irq_remove_handler(pio_get_irq_num(st_pio, 0), current);
-  
-    irq_set_enabled(pio_get_irq_num(st_pio, 1), false);
-    current = irq_get_exclusive_handler(pio_get_irq_num(st_pio, 1));
-    if(current) irq_remove_handler(pio_get_irq_num(st_pio, 1), current);
 
     next_line_addr = 0;
     if(dma_channel_is_claimed(st_dma)) {
@@ -507,12 +583,16 @@ void __not_in_flash_func(ST7701::start_frame_xfer)()
     if(dma_channel_is_claimed(st_dma2)) {
       dma_channel_unclaim(st_dma2);
     }
-    if(dma_channel_is_claimed(st_dma3)) {
+    if(st_dma3 >= 0 && dma_channel_is_claimed(st_dma3)) {
+      dma_channel_abort(st_dma3);
       dma_channel_unclaim(st_dma3);
     }
-    if(dma_channel_is_claimed(st_dma4)) {
+    if(st_dma4 >= 0 && dma_channel_is_claimed(st_dma4)) {
+      dma_channel_abort(st_dma4);
       dma_channel_unclaim(st_dma4);
     }
+    st_dma3 = -1;
+    st_dma4 = -1;
 
     if(pio_sm_is_claimed(st_pio, parallel_sm)) {
       pio_sm_set_enabled(st_pio, parallel_sm, false);
@@ -520,18 +600,45 @@ void __not_in_flash_func(ST7701::start_frame_xfer)()
       pio_sm_unclaim(st_pio, parallel_sm);
     }
 
-    if(pio_sm_is_claimed(st_pio, timing_sm)) {
-      pio_sm_set_enabled(st_pio, timing_sm, false);
-      pio_sm_clear_fifos(st_pio, timing_sm);
-      pio_sm_unclaim(st_pio, timing_sm);
-    }
-
     if(palette && pio_sm_is_claimed(st_pio, palette_sm)) {
       pio_sm_set_enabled(st_pio, palette_sm, false);
       pio_sm_clear_fifos(st_pio, palette_sm);
       pio_sm_unclaim(st_pio, palette_sm);
     }
 
+    if (palette) {
+      pio_remove_program(st_pio, &st7701_parallel_18bpp_program, parallel_offset);
+      pio_remove_program(st_pio, &st7701_palette_program, palette_offset);
+    }
+    else {
+      pio_remove_program(st_pio, &st7701_parallel_program, parallel_offset);
+    }
+
+    pixels_running = false;
+  }
+
+  void ST7701::cleanup() {
+    cleanup_pixels();
+
+    if(timing_dma >= 0 && dma_channel_is_claimed(timing_dma)) {
+      // Stop the timing channel restarting itself before aborting it
+      dma_channel_config config = dma_get_channel_config(timing_dma);
+      channel_config_set_chain_to(&config, timing_dma);
+      dma_channel_set_config(timing_dma, &config, false);
+      dma_channel_abort(timing_dma2);
+      dma_channel_abort(timing_dma);
+      dma_channel_unclaim(timing_dma);
+      dma_channel_unclaim(timing_dma2);
+    }
+    timing_dma = -1;
+    timing_dma2 = -1;
+
+    if(pio_sm_is_claimed(st_pio, timing_sm)) {
+      pio_sm_set_enabled(st_pio, timing_sm, false);
+      pio_sm_clear_fifos(st_pio, timing_sm);
+      pio_sm_unclaim(st_pio, timing_sm);
+    }
+
     pio_clear_instruction_memory(st_pio);
   }
 
@@ -559,9 +666,8 @@ void __not_in_flash_func(ST7701::start_frame_xfer)()
     spi_write16_blocking(spi, &_command, 1);
 
     if(data) {
-      // Add leading bytes for 9th D/CX bits
-      // TODO: OOOF - I *think* this is how 9bit SPI is supposed to work!?
-      // We'd probably be better off with some dedicated PIO tomfoolery
+      // Add leading bytes for 9th D/CX bits, the SPI is set to 9-bit frames
+      // so only the bottom 9 bits of each word are sent.
       for(auto i = 0u; i < len; i++) {
         _data[i] = (dcx::DATA << 8) | data[i];
       }
@@ -572,75 +678,68 @@ void __not_in_flash_func(ST7701::start_frame_xfer)()
   }
   
   void ST7701::update(PicoGraphics *graphics) {
+    begin_present();
+
     if(graphics->pen_type == PicoGraphics::PEN_RGB565 && !palette) { // Display buffer is screen native
       if (graphics->frame_buffer == framebuffer) {
         // Nothing to do
-        return;
       }
-
-      // Take care to copy while not passing the point in the frame buffer
-      // that is currently being scanned out to the screen.  This prevents tearing.
-      uint16_t* src_ptr = (uint16_t*)graphics->frame_buffer;
-      uint16_t* src_ptr2 = (uint16_t*)graphics->frame_buffer + width * height;
-      uint16_t* dst_ptr = framebuffer;
-      uint16_t* end_ptr = dst_ptr + width * height;
-      volatile uintptr_t* next_addr_ptr = (volatile uintptr_t*)&next_line_addr;
-
-      while (dst_ptr != end_ptr) {
-        uint16_t* next_addr = (uint16_t*)*next_addr_ptr;
-        if (!next_addr || next_addr == framebuffer) {
-          next_addr = framebuffer + width * height;
-        }
-
-        next_addr -= width;
-        if (next_addr < dst_ptr) {
-          // Ahead of the scanout, race the beam.
-          next_addr = end_ptr;
-        }
-        if (dst_ptr < next_addr) {
-          if (graphics->layers == 1) {
-            // Copy up to the current line being scanned out
-            int len = next_addr - dst_ptr;
-            memcpy(dst_ptr, src_ptr, len * sizeof(uint16_t));
-            dst_ptr += len;
-            src_ptr += len;
-          } else {
-            // Assume 2 layers
-            while (dst_ptr < next_addr) {
-              *dst_ptr++ = *src_ptr2 ? *src_ptr2 : *src_ptr;
-              ++src_ptr2;
-              ++src_ptr;
-            }
-          }
+      else if (damage_tracking) {
+        update_damaged(graphics);
+      }
+      else {
+        // Take care to copy while not passing the point in the frame buffer
+        // that is currently being scanned out to the screen.  This prevents tearing.
+        // Rows are checked one at a time, since the scanout may start part way
+        // down the frame buffer if the display is scrolled.
+        const uint16_t* src = (const uint16_t*)graphics->frame_buffer;
+        for (int y = 0; y < height; ++y) {
+          wait_for_rows(y, 1);
+          composite_rgb565(framebuffer + y * width, src + y * width, width, width * height, graphics->layers, layer_config);
         }
       }
     } else if (graphics->pen_type == PicoGraphics::PEN_P8 && palette) {
-      wait_for_vsync();
+      // Find the palette entries that have changed before waiting for vsync,
+      // so that only those need to be written while the screen isn't being drawn.
       PicoGraphics_PenP8* pen8 = static_cast<PicoGraphics_PenP8*>(graphics);
-      RGB* palette = pen8->get_palette();
+      RGB* graphics_palette = pen8->get_palette();
+      uint32_t dirty[256 / 32] = {0};
+      bool palette_changed = false;
       for (int i = 0; i < 256; ++i) {
-        set_palette_colour(i, palette[i]);
+        if (palette_locked[i >> 5] & (1u << (i & 31))) continue;
+        if (encode_palette_colour(graphics_palette[i]) != palette[i]) {
+          dirty[i >> 5] |= 1u << (i & 31);
+          palette_changed = true;
+        }
       }
-      if (graphics->layers == 1) {
-        memcpy(framebuffer, graphics->frame_buffer, width * height);
+
+      const uint8_t* src = (uint8_t*)graphics->frame_buffer;
+      uint8_t* dst = (uint8_t*)framebuffer;
+      const size_t layer_offset = width * height;
+
+      if (palette_changed) {
+        block_for_vsync();
+        for (int i = 0; i < 256 / 32; ++i) {
+          uint32_t bits = dirty[i];
+          while (bits) {
+            const int entry = (i << 5) + __builtin_ctz(bits);
+            bits &= bits - 1;
+            palette[entry] = encode_palette_colour(graphics_palette[entry]);
+          }
+        }
+        composite_p8(dst, src, width * height, layer_offset, graphics->layers, layer_config);
       }
       else {
-        uint8_t* dst = (uint8_t*)framebuffer;
-        const uint8_t* end = dst + width * height;
-        uint8_t* src = (uint8_t*)graphics->frame_buffer;
-        const size_t layer_offset = width * height;
-        const int top_layer_idx = graphics->layers - 1;
-
-        while (dst != end) {
-          uint8_t colour = 0;
-          for (int layer = top_layer_idx; layer >= 0; --layer) {
-            colour = *(src + layer * layer_offset);
-            if (colour) break;
-          }
-          *dst++ = colour;
-          ++src;
+        // Only pixel data has changed, so there's no need to wait for vsync.
+        // Race the beam a row at a time instead.
+        for (int y = 0; y < height; ++y) {
+          wait_for_rows(y, 1);
+          composite_p8(dst + y * width, src + y * width, width, layer_offset, graphics->layers, layer_config);
         }
       }
+    } else if (!palette && (graphics->pen_type == PicoGraphics::PEN_P4 || graphics->pen_type == PicoGraphics::PEN_P8 ||
+                            graphics->pen_type == PicoGraphics::PEN_RGB888)) {
+      update_converted(graphics);
     } else {
       uint8_t* frame_ptr = (uint8_t*)framebuffer;
       graphics->frame_convert(PicoGraphics::PEN_RGB565, [this, &frame_ptr](void *data, size_t length) {
@@ -650,20 +749,314 @@ void __not_in_flash_func(ST7701::start_frame_xfer)()
         }
       });
     }
+
+    end_present();
   }
 
-  void ST7701::partial_update(PicoGraphics *graphics, Rect region) {
-    if (graphics->pen_type == PicoGraphics::PEN_RGB565 && !palette && graphics->layers == 1) { // Display buffer is screen native
-      for (int y = region.y; y < region.y + region.h; ++y) {
-        memcpy(&framebuffer[y * width + region.x], (uint16_t*)graphics->frame_buffer + y * width + region.x, region.w * sizeof(uint16_t));
+  void ST7701::update_converted(PicoGraphics *graphics) {
+    const size_t layer_offset = width * height;
+    const uint layers = graphics->layers;
+
+    if (graphics->pen_type == PicoGraphics::PEN_RGB888) {
+      const uint32_t* src = (const uint32_t*)graphics->frame_buffer;
+      for (int y = 0; y < height; ++y) {
+        wait_for_rows(y, 1);
+        convert_rgb888_rgb565(framebuffer + y * width, src + y * width, width, layer_offset, layers);
+      }
+      return;
+    }
+
+    // Look up palette colours rather than converting every pixel
+    const bool p4 = graphics->pen_type == PicoGraphics::PEN_P4;
+    RGB* graphics_palette = graphics->get_palette();
+    const int palette_size = p4 ? 16 : 256;
+    for (int i = 0; i < palette_size; ++i) {
+      convert_lut[i] = graphics_palette[i].to_rgb565();
+    }
+    if (p4) make_p4_pair_lut(convert_pair_lut, convert_lut);
+
+    const uint8_t* src = (const uint8_t*)graphics->frame_buffer;
+    for (int y = 0; y < height; ++y) {
+      uint16_t* dst = framebuffer + y * width;
+      if (p4) {
+        const uint8_t* row = src + ((y * width) >> 1);
+        if (layers > 1) composite_p4(convert_row, row, width, layer_offset, layers, layer_config);
+        wait_for_rows(y, 1);
+        if (layers > 1) convert_p8_rgb565(dst, convert_row, width, convert_lut);
+        else convert_p4_rgb565(dst, row, width, convert_pair_lut);
+      } else {
+        const uint8_t* row = src + y * width;
+        if (layers > 1) composite_p8(convert_row, row, width, layer_offset, layers, layer_config);
+        wait_for_rows(y, 1);
+        convert_p8_rgb565(dst, layers > 1 ? convert_row : row, width, convert_lut);
+      }
+    }
+  }
+
+  static inline uint32_t hash_tile(const uint16_t* src, int stride) {
+    // FNV-1a over 32-bit words, any change to a single word always changes the hash
+    uint32_t hash = 2166136261u;
+    for (int y = 0; y < ST7701::DAMAGE_TILE_SIZE; ++y) {
+      const uint32_t* ptr = (const uint32_t*)(src + y * stride);
+      for (int x = 0; x < ST7701::DAMAGE_TILE_SIZE / 2; ++x) {
+        hash = (hash ^ *ptr++) * 16777619u;
+      }
+    }
+    return hash;
+  }
+
+  void ST7701::update_damaged(PicoGraphics *graphics) {
+    const int tiles_x = width / DAMAGE_TILE_SIZE;
+    const int tiles_y = height / DAMAGE_TILE_SIZE;
+    const size_t layer_offset = width * height;
+    const uint16_t* src = (const uint16_t*)graphics->frame_buffer;
+
+    tiles_copied = 0;
+
+    for (int ty = 0; ty < tiles_y; ++ty) {
+      const int y = ty * DAMAGE_TILE_SIZE;
+      uint32_t dirty = 0;
+
+      // Hash every layer of each tile in this row, a change to any of them dirties the tile
+      for (int tx = 0; tx < tiles_x; ++tx) {
+        const uint16_t* tile = src + y * width + tx * DAMAGE_TILE_SIZE;
+        uint32_t hash = 0;
+        for (uint layer = 0; layer < graphics->layers; ++layer) {
+          hash = (hash * 31) ^ hash_tile(tile + layer * layer_offset, width);
+        }
+
+        uint32_t& last_hash = tile_hashes[ty * tiles_x + tx];
+        if (!damage_valid || hash != last_hash) {
+          last_hash = hash;
+          dirty |= 1u << tx;
+        }
+      }
+
+      if (!dirty) continue;
+
+      tiles_copied += __builtin_popcount(dirty);
+      wait_for_rows(y, DAMAGE_TILE_SIZE);
+
+      for (int row = y; row < y + DAMAGE_TILE_SIZE; ++row) {
+        // Copy each run of adjacent dirty tiles in one go
+        uint32_t runs = dirty;
+        while (runs) {
+          const int tx = __builtin_ctz(runs);
+          const int run = __builtin_ctz(~(runs >> tx));
+          runs &= ~(((1u << run) - 1) << tx);
+
+          const size_t offset = row * width + tx * DAMAGE_TILE_SIZE;
+          composite_rgb565(framebuffer + offset, src + offset, run * DAMAGE_TILE_SIZE, layer_offset, graphics->layers, layer_config);
+        }
       }
     }
-    else if (graphics->pen_type == PicoGraphics::PEN_P8 && palette && graphics->layers == 1) {
+
+    damage_valid = true;
+  }
+
+  void ST7701::wait_for_rows(int y, int h) {
+    // The scanout is reading the row before display_row, and will read display_row next.
+    // Rows behind those will next be read in the following frame, and rows ahead of
+    // them can be written before the scanout reaches them, so only wait while it's
+    // reading the rows we want to write.
+    // Rows are compared in frame buffer order, so wrap around when scrolled.
+    // The interrupt changes all of these, so read them afresh on every pass.
+    volatile int* display_row_ptr = &display_row;
+    const volatile int* scroll_ptr = &scroll;
+    const uint16_t* const volatile* line_table_ptr = &line_table;
+    const volatile uint32_t* frames_ptr = &stats.frames;
+    const uint32_t frame = *frames_ptr;
+    bool waited = false;
+    while (true) {
+      // During vblank the beam is ahead of every row, and the copy will stay ahead of it
+      const int line = *display_row_ptr;
+      if (line >= DISPLAY_HEIGHT) break;
+
+      const uint16_t* table = *line_table_ptr;
+      if (table) {
+        // A table may read the rows we want on every line, so wait no longer than the next frame
+        if (*frames_ptr != frame) break;
+
+        // Lines may come from anywhere in the frame buffer, so check the line being read and the next one
+        const int current = line > 0 ? table[line - 1] : -1;
+        const int next = table[line];
+        if ((current < y || current >= y + h) && (next < y || next >= y + h)) break;
+      }
+      else {
+        int row = line / row_scale + *scroll_ptr - y;
+        if (row < 0) row += height;
+        else if (row >= height) row -= height;
+        if (row > h) break;
+      }
+      waited = true;
+    }
+    if (waited) ++stats.beam_waits;
+  }
+
+  void ST7701::block_for_vsync() {
+    const uint32_t start = time_us_32();
+    wait_for_vsync();
+    stats.vsync_wait_us += time_us_32() - start;
+  }
+
+  void ST7701::begin_present() {
+    present_start = time_us_32();
+    present_vsync_wait_us = stats.vsync_wait_us;
+  }
+
+  void ST7701::end_present() {
+    // Time blocked waiting for vsync is counted separately
+    const uint32_t waited = stats.vsync_wait_us - present_vsync_wait_us;
+    stats.update_us += time_us_32() - present_start - waited;
+
+    ++stats.presents;
+
+    // The first present has nothing to measure an interval from
+    const uint32_t frame = stats.frames;
+    if (have_last_present) {
+      const uint32_t interval = frame - last_present_frame;
+      ++stats.intervals[std::min(interval, (uint32_t)FRAME_INTERVAL_BINS - 1)];
+      if (interval > 1) stats.missed_vsyncs += interval - 1;
+    }
+    last_present_frame = frame;
+    have_last_present = true;
+  }
+
+  void ST7701::set_line_table(const uint16_t* table) {
+    // Don't overwrite a table that is still waiting to be scanned out
+    if (line_table_pending) block_for_vsync();
+
+    if (table) {
+      uint16_t* dst = line_table == line_tables[0] ? line_tables[1] : line_tables[0];
+      memcpy(dst, table, sizeof(line_tables[0]));
+      next_line_table = dst;
+    } else {
+      next_line_table = nullptr;
+    }
+    // Make sure the table is in place before the end of line interrupt can see it
+    __dmb();
+    line_table_pending = true;
+  }
+
+  void ST7701::flip(PicoGraphics *graphics) {
+    uint16_t* back_buffer = (uint16_t*)graphics->frame_buffer;
+    uint16_t* front_buffer = framebuffer;
+    if (back_buffer == front_buffer) return;
+
+    begin_present();
+    set_framebuffer(back_buffer);
+    damage_valid = false;
+
+    // Once the next frame has started the old front buffer is no longer
+    // being read, so it is safe to draw into it.
+    block_for_vsync();
+    graphics->frame_buffer = front_buffer;
+    end_present();
+  }
+
+  bool ST7701::clip_region(PicoGraphics *graphics, Rect &region) {
+    region = region.intersection(Rect(0, 0, width, height));
+    if (region.empty()) return false;
+
+    if (!palette) {
+      // The RGB565 compositor works on pairs of pixels, so widen the region to even columns
+      region.w += region.x & 1;
+      region.x &= ~1;
+      region.w = (region.w + 1) & ~1;
+    }
+    return true;
+  }
+
+  void ST7701::copy_region(PicoGraphics *graphics, int x, int y, int w, int h) {
+    const size_t layer_offset = width * height;
+
+    // Race the beam a row at a time as update() does, so only rows that are
+    // about to be scanned out have to wait.
+
+    if (graphics->pen_type == PicoGraphics::PEN_RGB565 && !palette) { // Display buffer is screen native
+      const uint16_t* src = (uint16_t*)graphics->frame_buffer;
+      for (int row = y; row < y + h; ++row) {
+        wait_for_rows(row, 1);
+        const size_t offset = row * width + x;
+        composite_rgb565(framebuffer + offset, src + offset, w, layer_offset, graphics->layers, layer_config);
+      }
+    }
+    else if (graphics->pen_type == PicoGraphics::PEN_P8 && palette) {
       uint8_t* fb8 = (uint8_t*)framebuffer;
-      for (int y = region.y; y < region.y + region.h; ++y) {
-        memcpy(&fb8[y * width + region.x], (uint8_t*)graphics->frame_buffer + y * width + region.x, region.w * sizeof(uint8_t));
+      const uint8_t* src = (uint8_t*)graphics->frame_buffer;
+      for (int row = y; row < y + h; ++row) {
+        wait_for_rows(row, 1);
+        const size_t offset = row * width + x;
+        composite_p8(fb8 + offset, src + offset, w, layer_offset, graphics->layers, layer_config);
+      }
+    }
+  }
+
+  void ST7701::partial_update(PicoGraphics *graphics, Rect region) {
+    if (graphics->frame_buffer == framebuffer) {
+      // Nothing to do
+      return;
+    }
+
+    begin_present();
+    if (clip_region(graphics, region)) {
+      copy_region(graphics, region.x, region.y, region.w, region.h);
+    }
+    end_present();
+  }
+
+  void ST7701::partial_update(PicoGraphics *graphics, Rect *regions, uint count) {
+    if (graphics->frame_buffer == framebuffer) {
+      // Nothing to do
+      return;
+    }
+
+    begin_present();
+
+    // Drop empty regions, and sort the rest left to right
+    uint n = 0;
+    for (uint i = 0; i < count; ++i) {
+      if (clip_region(graphics, regions[i])) regions[n++] = regions[i];
+    }
+    std::sort(regions, regions + n, [](const Rect &a, const Rect &b) { return a.x < b.x; });
+
+    // Split the screen into bands of rows where the same regions overlap, then
+    // copy each run of overlapping or adjacent regions across the band once.
+    int band_start = height;
+    for (uint i = 0; i < n; ++i) band_start = std::min(band_start, (int)regions[i].y);
+
+    while (band_start < height) {
+      int band_end = height;
+      for (uint i = 0; i < n; ++i) {
+        const int top = regions[i].y;
+        const int bottom = regions[i].y + regions[i].h;
+        if (top > band_start) band_end = std::min(band_end, top);
+        if (bottom > band_start) band_end = std::min(band_end, bottom);
+      }
+
+      int run_start = 0;
+      int run_end = 0;
+      for (uint i = 0; i < n; ++i) {
+        const Rect &r = regions[i];
+        if (r.y > band_start || r.y + r.h <= band_start) continue;
+
+        if (r.x > run_end) {
+          if (run_end > run_start) copy_region(graphics, run_start, band_start, run_end - run_start, band_end - band_start);
+          run_start = r.x;
+        }
+        run_end = std::max(run_end, (int)(r.x + r.w));
+      }
+      if (run_end > run_start) copy_region(graphics, run_start, band_start, run_end - run_start, band_end - band_start);
+
+      // The next band starts at the top of the next region still to be copied
+      int next_start = height;
+      for (uint i = 0; i < n; ++i) {
+        if (regions[i].y + regions[i].h > band_end) next_start = std::min(next_start, std::max((int)regions[i].y, band_end));
       }
+      band_start = next_start;
     }
+
+    end_present();
   }
 
   void ST7701::set_backlight(uint8_t brightness) {
@@ -678,27 +1071,13 @@ void __not_in_flash_func(ST7701::start_frame_xfer)()
   void ST7701::set_palette_colour(uint8_t entry, RGB888 colour) {
     if (!palette) return;
 
-    // Note bit reversal is done by PIO.
-    uint32_t encoded_colour = 
-      ((colour << 8)  & 0xF8000000) |  // R
-      ((colour << 11) & 0x07E00000) |  // G
-      ((colour << 13) & 0x001F8000) |  // B
-      ((colour >> 4)  & 0x00004000);   // Low bit of R
-
-    palette[entry] = encoded_colour;
+    palette[entry] = encode_palette_colour(colour);
   }
 
   void ST7701::set_palette_colour(uint8_t entry, const RGB& colour) {
     if (!palette) return;
 
-    // Note bit reversal is done by PIO.
-    uint32_t encoded_colour = 
-      ((colour.r << 24) & 0xF8000000) |  // R
-      ((colour.g << 19) & 0x07E00000) |  // G
-      ((colour.b << 13) & 0x001F8000) |  // B
-      ((colour.r << 12) & 0x00004000);   // Low bit of R
-
-    palette[entry] = encoded_colour;
+    palette[entry] = encode_palette_colour(colour);
   }
 
   void __no_inline_not_in_flash_func(ST7701::wait_for_vsync()) {
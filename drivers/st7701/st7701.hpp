@@ -9,6 +9,7 @@
 #include "common/pimoroni_common.hpp"
 #include "common/pimoroni_bus.hpp"
 #include "libraries/pico_graphics/pico_graphics.hpp"
+#include "st7701_composite.hpp"
 
 #include <algorithm>
 #include <cstring>
@@ -39,6 +40,8 @@ namespace pimoroni {
     uint st_dma2;
     int st_dma3 = -1;
     int st_dma4 = -1;
+    int timing_dma = -1;
+    int timing_dma2 = -1;
 
     uint d0 = 1; // First pin of 18-bit parallel interface
     uint hsync  = 19;
@@ -50,6 +53,26 @@ namespace pimoroni {
     static const uint32_t BACKLIGHT_PWM_TOP = 6200;
 
   public:
+    // Damage tracking splits the screen into square tiles, this must divide 240
+    static const int DAMAGE_TILE_SIZE = 16;
+    static const int MAX_DAMAGE_TILES = (480 / DAMAGE_TILE_SIZE) * (480 / DAMAGE_TILE_SIZE);
+
+    // A line table has one frame buffer row for each line of the panel
+    static const int LINE_TABLE_SIZE = 480;
+
+    // Frame timing counters, cheap enough to leave running all the time
+    static const int FRAME_INTERVAL_BINS = 8;
+    struct FrameStats {
+      uint32_t frames = 0;         // Frames scanned out
+      uint32_t presents = 0;       // Calls to update, partial_update and flip
+      uint32_t update_us = 0;      // Time those calls spent copying and compositing
+      uint32_t vsync_wait_us = 0;  // Time those calls spent blocked waiting for vsync
+      uint32_t beam_waits = 0;     // Times a copy had to wait for the scanout to move on
+      uint32_t missed_vsyncs = 0;  // Frames scanned out with no present since the last
+      // Presents by the number of frames since the last present, the last bin is that many or more
+      uint32_t intervals[FRAME_INTERVAL_BINS] = {0};
+    };
+
     // Parallel init
     ST7701(uint16_t width, uint16_t height, Rotation rotation, SPIPins control_pins, uint16_t* framebuffer, uint32_t* palette = nullptr,
       uint d0=1, uint hsync=19, uint vsync=20, uint lcd_de = 21, uint lcd_dot_clk = 22);
@@ -57,8 +80,19 @@ namespace pimoroni {
 
     void init();
     void cleanup() override;
+
+    // The panel and its timing can be left running while the pixel path is
+    // stopped and restarted with a new layout, avoiding a full init.
+    void init_pixels();
+    void cleanup_pixels();
+    bool is_running() const;
+    void set_layout(uint16_t width, uint16_t height, uint16_t* framebuffer, uint32_t* palette);
     void update(PicoGraphics *graphics) override;
     void partial_update(PicoGraphics *display, Rect region) override;
+
+    // Update several regions at once, merging them so no pixel is copied twice.
+    // The regions are clipped and reordered in place.
+    void partial_update(PicoGraphics *display, Rect *regions, uint count);
     void set_backlight(uint8_t brightness) override;
 
     void set_palette_colour(uint8_t entry, RGB888 colour);
@@ -68,14 +102,103 @@ namespace pimoroni {
     // It is MSB aligned, i.e. the top bit of red is in the MSB.
     uint32_t get_encoded_palette_entry(uint8_t entry) const { return palette[entry]; }
 
+    // Locked palette entries are left alone by update(), eg: while they are being animated.
+    // locked holds one bit per entry, each word is replaced whole so an entry that stays
+    // locked is never seen unlocked by update() on the other core.
+    void set_palette_locks(const uint32_t* locked) {
+      for (int i = 0; i < 256 / 32; ++i) palette_locked[i] = locked[i];
+      __dmb();
+    }
+
+    static uint32_t encode_palette_colour(RGB888 colour) {
+      // Note bit reversal is done by PIO.
+      return
+        ((colour << 8)  & 0xF8000000) |  // R
+        ((colour << 11) & 0x07E00000) |  // G
+        ((colour << 13) & 0x001F8000) |  // B
+        ((colour >> 4)  & 0x00004000);   // Low bit of R
+    }
+
+    static RGB888 decode_palette_colour(uint32_t encoded) {
+      const uint32_t r = ((encoded >> 24) & 0xF8) | ((encoded >> 12) & 0x04);
+      const uint32_t g = (encoded >> 19) & 0xFC;
+      const uint32_t b = (encoded >> 13) & 0xFC;
+      return (r << 16) | (g << 8) | b;
+    }
+
+    static uint32_t encode_palette_colour(const RGB& colour) {
+      // Note bit reversal is done by PIO.
+      return
+        ((colour.r << 24) & 0xF8000000) |  // R
+        ((colour.g << 19) & 0x07E00000) |  // G
+        ((colour.b << 13) & 0x001F8000) |  // B
+        ((colour.r << 12) & 0x00004000);   // Low bit of R
+    }
+
     void set_framebuffer(uint16_t* next_fb) {
       next_framebuffer = next_fb;
     }
 
+    // Start the scanout y rows down the frame buffer from the next vsync, wrapping
+    // around to the top.  Row y of the frame buffer appears at the top of the screen.
+    void set_scroll(int y) {
+      y %= (int)height;
+      if (y < 0) y += height;
+      next_scroll = y;
+    }
+    int get_scroll() const { return next_scroll; }
+
+    // The frame buffer row on row y of the screen for the frame being scanned out,
+    // following the line table if one is set, or else the scroll.
+    int get_scanout_row(int y) const {
+      if (line_table) return line_table[y * row_scale];
+      const int row = y + scroll;
+      return row >= height ? row - height : row;
+    }
+
+    // Scan out the frame buffer row given by table[line] for each line of the panel
+    // from the next vsync, instead of the usual rows.  The table is copied, and
+    // nullptr goes back to the usual rows.  Scrolling is ignored while a table is set.
+    void set_line_table(const uint16_t* table);
+    bool has_line_table() const { return line_table_pending ? next_line_table != nullptr : line_table != nullptr; }
+
+    // The buffer currently being scanned out to the screen
+    uint16_t* get_framebuffer() const { return framebuffer; }
+
+    // Scan out the PicoGraphics buffer from the next vsync and hand the old
+    // front buffer back to PicoGraphics, instead of copying.
+    void flip(PicoGraphics *graphics);
+
+    // When enabled, update() only copies tiles of an RGB565 PicoGraphics buffer
+    // that have changed since the previous update.
+    void set_damage_tracking(bool enable) {
+      damage_tracking = enable;
+      damage_valid = false;
+    }
+    bool get_damage_tracking() const { return damage_tracking; }
+
+    // Number of tiles copied by the last damage tracked update
+    uint get_tiles_copied() const { return tiles_copied; }
+
+    // Layers above the bottom one are transparent where they match their colour key,
+    // and RGB565 layers can be blended over the layers below.
+    void set_layer_config(uint layer, uint16_t key, LayerOpacity opacity) {
+      layer_config[layer].key = key;
+      layer_config[layer].opacity = opacity;
+      damage_valid = false;
+    }
+    const LayerConfig& get_layer_config(uint layer) const { return layer_config[layer]; }
+
+    const FrameStats& get_stats() const { return stats; }
+    void reset_stats() {
+      stats = FrameStats();
+      // The frame counter may already have moved on, so start timing from the next present
+      have_last_present = false;
+    }
+
     void wait_for_vsync();
 
     // Only to be called by ISR
-    void drive_timing();
     void handle_end_of_line();
 
   private:
@@ -86,20 +209,55 @@ namespace pimoroni {
     void start_line_xfer();
     void start_frame_xfer();
 
-    // Timing status
-    uint16_t timing_row = 0;
-    uint16_t timing_phase = 0;
+    void update_damaged(PicoGraphics *graphics);
+    void update_converted(PicoGraphics *graphics);
+    bool clip_region(PicoGraphics *graphics, Rect &region);
+    void copy_region(PicoGraphics *graphics, int x, int y, int w, int h);
+    void wait_for_rows(int y, int h);
+    uint32_t get_clk_div() const;
+    void block_for_vsync();
+    void begin_present();
+    void end_present();
+
+    // Timing SM instructions for a whole frame, four for each row including blanking
+    static const int TIMING_TABLE_SIZE = 498 * 4;
+    uint32_t timing_table[TIMING_TABLE_SIZE];
+    const uint32_t* timing_table_addr = nullptr;
     volatile bool waiting_for_vsync = false;
+    bool pixels_running = false;
 
     uint16_t* framebuffer;
     uint16_t* next_framebuffer = nullptr;
 
     uint32_t* palette = nullptr;
+    volatile uint32_t palette_locked[256 / 32] = {0};
 
     uint16_t* next_line_addr;
     int display_row = 0;
-    int row_shift = 0;
+    int row_scale = 1;
+    int scroll = 0;
+    int next_scroll = 0;
+
+    // Line tables are double buffered, so one can be filled while the other is scanned out
+    uint16_t line_tables[2][LINE_TABLE_SIZE];
+    const uint16_t* line_table = nullptr;
+    const uint16_t* next_line_table = nullptr;
+    volatile bool line_table_pending = false;
     int fill_row = 0;
+
+    // Damage tracking, one hash per tile of the last buffer contents copied
+    bool damage_tracking = false;
+    bool damage_valid = false;
+    uint tiles_copied = 0;
+    uint32_t tile_hashes[MAX_DAMAGE_TILES];
+
+    LayerConfig layer_config[MAX_LAYERS];
+
+    FrameStats stats;
+    uint32_t last_present_frame = 0;
+    bool have_last_present = false;
+    uint32_t present_start = 0;
+    uint32_t present_vsync_wait_us = 0;
   };
 
 }
\ No newline at end of file
@@ -0,0 +1,309 @@
+#pragma once
+
+// Layer compositing and pen type conversion for the ST7701 driver.
+//
+// These have no dependencies on the Pico SDK so they can be built and
+// benchmarked on the host.
+
+#include <cstdint>
+#include <cstddef>
+#include <cstring>
+
+namespace pimoroni {
+
+  // presto_buffer has room for three RGB565 layers, or six P8 layers, at half res
+  static const int MAX_RGB565_LAYERS = 3;
+  static const int MAX_LAYERS = 6;
+
+  // How much of the layers below show through the opaque pixels of a layer
+  enum LayerOpacity : uint8_t {
+    OPACITY_100 = 0,
+    OPACITY_50 = 1,
+    OPACITY_25 = 2,
+  };
+
+  struct LayerConfig {
+    // Pixels of this value are transparent, for RGB565 this is the byte swapped pen value
+    uint16_t key = 0;
+    LayerOpacity opacity = OPACITY_100;
+  };
+
+  // Returns 0xFFFF in each 16-bit half of word that holds a non-zero pixel.
+  static inline uint32_t rgb565_opaque_mask(uint32_t word) {
+    // Adding 0x7FFF carries into the top bit of each half if any of the lower 15 bits are set
+    uint32_t nonzero = ((word & 0x7FFF7FFFu) + 0x7FFF7FFFu) | word;
+    return ((nonzero & 0x80008000u) >> 15) * 0xFFFFu;
+  }
+
+  // Swap the bytes of each pixel, PicoGraphics stores RGB565 big endian.
+  static inline uint32_t rgb565_swap(uint32_t word) {
+    return ((word & 0xFF00FF00u) >> 8) | ((word & 0x00FF00FFu) << 8);
+  }
+
+  // Blend two pixels of colour over two pixels of below using shifts.
+  // The low bits of each channel are masked off so shifts don't bleed between channels.
+  static inline uint32_t rgb565_blend(uint32_t colour, uint32_t below, LayerOpacity opacity) {
+    colour = rgb565_swap(colour);
+    below = rgb565_swap(below);
+    if (opacity == OPACITY_50) {
+      colour = ((colour & 0xF7DEF7DEu) >> 1) + ((below & 0xF7DEF7DEu) >> 1);
+    } else {
+      colour = ((colour & 0xE79CE79Cu) >> 2) + ((below & 0xF7DEF7DEu) >> 1) + ((below & 0xE79CE79Cu) >> 2);
+    }
+    return rgb565_swap(colour);
+  }
+
+  // Composite len RGB565 pixels from up to three layers, each layer_offset pixels after the
+  // last, into dst.  Pixels matching the key of every layer but the bottom one are
+  // transparent, zero if no config is given.
+  //
+  // Pixels are handled two at a time, so dst, src, len and layer_offset must all be
+  // word aligned.
+  static inline void composite_rgb565(uint16_t* dst, const uint16_t* src, size_t len, size_t layer_offset, int layers, const LayerConfig* config = nullptr) {
+    if (layers == 1) {
+      memcpy(dst, src, len * sizeof(uint16_t));
+      return;
+    }
+    if (layers > MAX_RGB565_LAYERS) layers = MAX_RGB565_LAYERS;
+
+    uint32_t* dst32 = (uint32_t*)dst;
+    const uint32_t* src32 = (const uint32_t*)src;
+    const uint32_t* end32 = src32 + (len >> 1);
+    const size_t offset32 = layer_offset >> 1;
+
+    uint32_t keys[MAX_RGB565_LAYERS] = {0, 0, 0};
+    bool blending = false;
+    if (config) {
+      for (int layer = 1; layer < layers; ++layer) {
+        keys[layer] = config[layer].key * 0x00010001u;
+        blending |= config[layer].opacity != OPACITY_100;
+      }
+    }
+
+    if (blending) {
+      // Work up from the bottom layer, since blended layers need to know what is below them
+      while (src32 != end32) {
+        uint32_t colour = *src32;
+        for (int layer = 1; layer < layers; ++layer) {
+          const uint32_t above = src32[offset32 * layer];
+          const uint32_t opaque = rgb565_opaque_mask(above ^ keys[layer]);
+          if (opaque) {
+            const uint32_t blended = config[layer].opacity == OPACITY_100 ? above : rgb565_blend(above, colour, config[layer].opacity);
+            colour = (blended & opaque) | (colour & ~opaque);
+          }
+        }
+        *dst32++ = colour;
+        ++src32;
+      }
+    } else if (layers == 2) {
+      const uint32_t key = keys[1];
+      while (src32 != end32) {
+        const uint32_t top = src32[offset32];
+        if (top == key) {
+          *dst32++ = *src32;
+        } else {
+          const uint32_t opaque = rgb565_opaque_mask(top ^ key);
+          *dst32++ = opaque == 0xFFFFFFFFu ? top : (top & opaque) | (*src32 & ~opaque);
+        }
+        ++src32;
+      }
+    } else {
+      while (src32 != end32) {
+        // Work down from the top layer, stopping as soon as both pixels are opaque
+        const uint32_t top = src32[offset32 * 2];
+        uint32_t opaque = rgb565_opaque_mask(top ^ keys[2]);
+        uint32_t colour = top & opaque;
+        if (opaque != 0xFFFFFFFFu) {
+          const uint32_t middle = src32[offset32];
+          const uint32_t middle_opaque = rgb565_opaque_mask(middle ^ keys[1]) & ~opaque;
+          colour |= middle & middle_opaque;
+          opaque |= middle_opaque;
+          if (opaque != 0xFFFFFFFFu) {
+            colour |= *src32 & ~opaque;
+          }
+        }
+        *dst32++ = colour;
+        ++src32;
+      }
+    }
+  }
+
+  // Returns 0xFF in each byte of word that is non-zero.
+  static inline uint32_t p8_opaque_mask(uint32_t word) {
+    // As rgb565_opaque_mask, adding 0x7F carries into the top bit of each byte if any of the lower 7 bits are set
+    uint32_t nonzero = ((word & 0x7F7F7F7Fu) + 0x7F7F7F7Fu) | word;
+    return ((nonzero & 0x80808080u) >> 7) * 0xFFu;
+  }
+
+  // Composite len P8 pixels from up to six layers, each layer_offset pixels after
+  // the last, into dst.  Pixels matching the key of every layer but the bottom one
+  // are transparent, zero if no config is given.
+  //
+  // Pixels are handled four at a time where dst and src are equally aligned,
+  // layer_offset must be a multiple of four.
+  static inline void composite_p8(uint8_t* dst, const uint8_t* src, size_t len, size_t layer_offset, int layers, const LayerConfig* config = nullptr) {
+    if (layers == 1) {
+      memcpy(dst, src, len);
+      return;
+    }
+
+    const uint8_t* end = dst + len;
+    if (layers > MAX_LAYERS) layers = MAX_LAYERS;
+    const int top_layer_idx = layers - 1;
+
+    uint8_t keys[MAX_LAYERS] = {0};
+    if (config) {
+      for (int layer = 1; layer < layers; ++layer) {
+        keys[layer] = config[layer].key;
+      }
+    }
+
+    auto composite_pixel = [&]() {
+      uint8_t colour = 0;
+      for (int layer = top_layer_idx; layer >= 0; --layer) {
+        colour = *(src + layer * layer_offset);
+        if (colour != keys[layer]) break;
+      }
+      *dst++ = colour;
+      ++src;
+    };
+
+    if (((uintptr_t)dst ^ (uintptr_t)src) & 3) {
+      while (dst != end) composite_pixel();
+      return;
+    }
+
+    // Line up on a word boundary, then work a word at a time, leaving any odd pixels to the end
+    while (dst != end && ((uintptr_t)dst & 3)) composite_pixel();
+
+    uint32_t* dst32 = (uint32_t*)dst;
+    const uint32_t* src32 = (const uint32_t*)src;
+    const uint32_t* end32 = src32 + ((end - dst) >> 2);
+    const size_t offset32 = layer_offset >> 2;
+
+    uint32_t keys32[MAX_LAYERS];
+    for (int layer = 1; layer < layers; ++layer) keys32[layer] = keys[layer] * 0x01010101u;
+
+    while (src32 != end32) {
+      // Work down from the top layer, stopping as soon as all four pixels are opaque
+      uint32_t colour = 0;
+      uint32_t opaque = 0;
+      for (int layer = top_layer_idx; layer > 0; --layer) {
+        const uint32_t above = src32[offset32 * layer];
+        const uint32_t mask = p8_opaque_mask(above ^ keys32[layer]) & ~opaque;
+        colour |= above & mask;
+        opaque |= mask;
+        if (opaque == 0xFFFFFFFFu) break;
+      }
+      if (opaque != 0xFFFFFFFFu) colour |= *src32 & ~opaque;
+      *dst32++ = colour;
+      ++src32;
+    }
+
+    dst = (uint8_t*)dst32;
+    src = (const uint8_t*)src32;
+    while (dst != end) composite_pixel();
+  }
+
+  // Composite len P4 pixels, packed two to a byte with the first in the high nibble,
+  // into one palette index per byte of dst.  Works like composite_p8, layer_offset
+  // is in pixels and must be even.
+  static inline void composite_p4(uint8_t* dst, const uint8_t* src, size_t len, size_t layer_offset, int layers, const LayerConfig* config = nullptr) {
+    const uint8_t* end = dst + len;
+    if (layers > MAX_LAYERS) layers = MAX_LAYERS;
+    const int top_layer_idx = layers - 1;
+    layer_offset >>= 1;
+
+    uint8_t keys[MAX_LAYERS] = {0};
+    if (config) {
+      for (int layer = 1; layer < layers; ++layer) {
+        keys[layer] = config[layer].key & 0xF;
+      }
+    }
+
+    while (dst != end) {
+      uint8_t hi = 0;
+      for (int layer = top_layer_idx; layer >= 0; --layer) {
+        hi = src[layer * layer_offset] >> 4;
+        if (hi != keys[layer]) break;
+      }
+      uint8_t lo = 0;
+      for (int layer = top_layer_idx; layer >= 0; --layer) {
+        lo = src[layer * layer_offset] & 0xF;
+        if (lo != keys[layer]) break;
+      }
+      *dst++ = hi;
+      *dst++ = lo;
+      ++src;
+    }
+  }
+
+  // Convert an RGB888 colour to byte swapped RGB565.
+  static inline uint16_t rgb888_to_rgb565(uint32_t colour) {
+    const uint32_t rgb565 = ((colour >> 8) & 0xF800) | ((colour >> 5) & 0x07E0) | ((colour >> 3) & 0x001F);
+    return (uint16_t)((rgb565 >> 8) | (rgb565 << 8));
+  }
+
+  // Fill pair_lut with the two RGB565 pixels for each byte of P4 data, so P4 can
+  // be converted a byte at a time.  lut holds the 16 palette colours.
+  static inline void make_p4_pair_lut(uint32_t* pair_lut, const uint16_t* lut) {
+    for (int i = 0; i < 256; ++i) {
+      pair_lut[i] = lut[i >> 4] | ((uint32_t)lut[i & 0xF] << 16);
+    }
+  }
+
+  // Convert len palette indices to RGB565 through lut, which holds the byte swapped
+  // RGB565 colour of each entry.  dst must be word aligned and len even.
+  static inline void convert_p8_rgb565(uint16_t* dst, const uint8_t* src, size_t len, const uint16_t* lut) {
+    uint32_t* dst32 = (uint32_t*)dst;
+    const uint8_t* end = src + len;
+    while (src != end) {
+      *dst32++ = lut[src[0]] | ((uint32_t)lut[src[1]] << 16);
+      src += 2;
+    }
+  }
+
+  // Convert len packed P4 pixels to RGB565 using a table from make_p4_pair_lut.
+  // dst must be word aligned and len even.
+  static inline void convert_p4_rgb565(uint16_t* dst, const uint8_t* src, size_t len, const uint32_t* pair_lut) {
+    uint32_t* dst32 = (uint32_t*)dst;
+    const uint8_t* end = src + (len >> 1);
+    while (src != end) {
+      *dst32++ = pair_lut[*src++];
+    }
+  }
+
+  // Convert len RGB888 pixels from up to six layers, each layer_offset pixels after
+  // the last, to RGB565.  Black pixels in every layer but the bottom one are transparent.
+  // dst must be word aligned and len even.
+  static inline void convert_rgb888_rgb565(uint16_t* dst, const uint32_t* src, size_t len, size_t layer_offset = 0, int layers = 1) {
+    uint32_t* dst32 = (uint32_t*)dst;
+    const uint32_t* end = src + len;
+    if (layers > MAX_LAYERS) layers = MAX_LAYERS;
+
+    if (layers == 1) {
+      while (src != end) {
+        // Pack two pixels and swap them together
+        const uint32_t a = src[0];
+        const uint32_t b = src[1];
+        const uint32_t pair = ((a >> 8) & 0xF800) | ((a >> 5) & 0x07E0) | ((a >> 3) & 0x001F) |
+                              ((b << 8) & 0xF8000000) | ((b << 11) & 0x07E00000) | ((b << 13) & 0x001F0000);
+        *dst32++ = rgb565_swap(pair);
+        src += 2;
+      }
+      return;
+    }
+
+    uint16_t* dst16 = dst;
+    while (src != end) {
+      uint32_t colour = 0;
+      for (int layer = layers - 1; layer >= 0; --layer) {
+        colour = src[layer * layer_offset];
+        if (colour & 0xFFFFFF) break;
+      }
+      *dst16++ = rgb888_to_rgb565(colour);
+      ++src;
+    }
+  }
+
+}
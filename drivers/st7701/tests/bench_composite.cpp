@@ -0,0 +1,56 @@
+// Times composite_rgb565 against the pixel at a time loop it replaced, on a
+// half res frame with a mostly transparent HUD layer.
+
+#include <chrono>
+#include <cstdio>
+#include <vector>
+
+#include "st7701_composite.hpp"
+
+using namespace pimoroni;
+
+// The previous two layer loop from ST7701::update
+static void previous_rgb565(uint16_t* dst, const uint16_t* src, size_t len, size_t layer_offset) {
+  const uint16_t* src_ptr2 = src + layer_offset;
+  uint16_t* end = dst + len;
+  while (dst < end) {
+    *dst++ = *src_ptr2 ? *src_ptr2 : *src;
+    ++src_ptr2;
+    ++src;
+  }
+}
+
+template<typename F> static void bench(const char* name, F fn) {
+  const int frames = 2000;
+  const auto start = std::chrono::steady_clock::now();
+  for (int i = 0; i < frames; ++i) {
+    fn();
+    asm volatile("" ::: "memory");
+  }
+  const std::chrono::duration<double, std::micro> elapsed = std::chrono::steady_clock::now() - start;
+  printf("%-32s %8.1f us/frame\n", name, elapsed.count() / frames);
+}
+
+int main() {
+  const size_t width = 240;
+  const size_t len = width * width;
+  std::vector<uint16_t> src(len * MAX_RGB565_LAYERS), dst(len);
+
+  // Opaque background, a status bar down the right of the middle layer, and an empty top layer
+  for (size_t i = 0; i < len; ++i) {
+    src[i] = 0xABCD;
+    src[i + len] = (i % width) > 200 ? 0x1234 : 0;
+    src[i + len * 2] = 0;
+  }
+
+  printf("bench_composite: RGB565, %zux%zu\n", width, width);
+  bench("previous 2 layers, per pixel", [&] { previous_rgb565(dst.data(), src.data(), len, len); });
+  bench("composite_rgb565 1 layer", [&] { composite_rgb565(dst.data(), src.data(), len, len, 1); });
+  bench("composite_rgb565 2 layers", [&] { composite_rgb565(dst.data(), src.data(), len, len, 2); });
+  bench("composite_rgb565 3 layers", [&] { composite_rgb565(dst.data(), src.data(), len, len, 3); });
+
+  LayerConfig blended[MAX_RGB565_LAYERS];
+  blended[1].opacity = OPACITY_50;
+  bench("composite_rgb565 2 layers, 50%", [&] { composite_rgb565(dst.data(), src.data(), len, len, 2, blended); });
+  return 0;
+}
@@ -0,0 +1,65 @@
+// Times composite_p8 against the byte at a time loop it replaced, on a
+// full res frame of sprite layers over a background.
+
+#include <chrono>
+#include <cstdio>
+#include <vector>
+
+#include "st7701_composite.hpp"
+
+using namespace pimoroni;
+
+// The previous byte at a time loop from ST7701::update
+static void previous_p8(uint8_t* dst, const uint8_t* src, size_t len, size_t layer_offset, int layers) {
+  const uint8_t* end = dst + len;
+  while (dst != end) {
+    uint8_t colour = 0;
+    for (int layer = layers - 1; layer >= 0; --layer) {
+      colour = *(src + layer * layer_offset);
+      if (colour) break;
+    }
+    *dst++ = colour;
+    ++src;
+  }
+}
+
+template<typename F> static void bench(const char* name, F fn) {
+  const int frames = 200;
+  const auto start = std::chrono::steady_clock::now();
+  for (int i = 0; i < frames; ++i) {
+    fn();
+    asm volatile("" ::: "memory");
+  }
+  const std::chrono::duration<double, std::micro> elapsed = std::chrono::steady_clock::now() - start;
+  printf("%-36s %8.1f us/frame\n", name, elapsed.count() / frames);
+}
+
+int main() {
+  const size_t width = 480;
+  const size_t len = width * width;
+  std::vector<uint8_t> src(len * MAX_LAYERS), dst(len);
+
+  // A background, with sprites covering about a tenth of the screen on each layer above it
+  for (size_t i = 0; i < len; ++i) src[i] = 1 + (i & 0x3F);
+  for (size_t layer = 1; layer < MAX_LAYERS; ++layer) {
+    for (size_t i = 0; i < len; ++i) {
+      const size_t x = i % width, y = i / width;
+      src[i + layer * len] = (x / 40 + y / 40) % 10 == layer ? 7 : 0;
+    }
+  }
+
+  printf("bench_composite_p8: P8, %zux%zu\n", width, width);
+  char name[64];
+  for (int layers = 2; layers <= MAX_LAYERS; layers += 2) {
+    snprintf(name, sizeof(name), "previous %d layers, sprites", layers);
+    bench(name, [&] { previous_p8(dst.data(), src.data(), len, len, layers); });
+    snprintf(name, sizeof(name), "composite_p8 %d layers, sprites", layers);
+    bench(name, [&] { composite_p8(dst.data(), src.data(), len, len, layers); });
+  }
+
+  // An opaque top layer hides everything below it
+  for (size_t i = len; i < len * 2; ++i) src[i] = 9;
+  bench("previous 2 layers, opaque top", [&] { previous_p8(dst.data(), src.data(), len, len, 2); });
+  bench("composite_p8 2 layers, opaque top", [&] { composite_p8(dst.data(), src.data(), len, len, 2); });
+  return 0;
+}
@@ -0,0 +1,117 @@
+// Times the table driven converters used by ST7701::update_converted against
+// the PicoGraphics frame_convert callback path they replaced, on a half res frame.
+
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <functional>
+#include <vector>
+
+#include "st7701_composite.hpp"
+
+using namespace pimoroni;
+
+// A model of PicoGraphics::frame_convert_rgb565: a std::function call per
+// pixel into a double buffered chunk, with a callback to copy out each chunk.
+typedef std::function<void(void*, size_t)> conversion_callback_func;
+typedef std::function<uint16_t()> next_pixel_func;
+
+static void frame_convert_rgb565(conversion_callback_func callback, next_pixel_func get_next_pixel, size_t len) {
+  const int BUF_LEN = 64;
+  uint16_t row_buf[2][BUF_LEN];
+  int buf_idx = 0;
+  int buf_entry = 0;
+  for (size_t i = 0; i < len; i++) {
+    row_buf[buf_idx][buf_entry] = get_next_pixel();
+    buf_entry++;
+    if (buf_entry == BUF_LEN) {
+      callback(row_buf[buf_idx], BUF_LEN * sizeof(uint16_t));
+      buf_idx ^= 1;
+      buf_entry = 0;
+    }
+  }
+  if (buf_entry > 0) callback(row_buf[buf_idx], buf_entry * sizeof(uint16_t));
+}
+
+static uint16_t to_rgb565(uint32_t colour) {
+  const uint16_t rgb565 = ((colour >> 8) & 0xF800) | ((colour >> 5) & 0x07E0) | ((colour >> 3) & 0x001F);
+  return (rgb565 >> 8) | (rgb565 << 8);
+}
+
+template<typename F> static void bench(const char* name, F fn) {
+  const int frames = 1000;
+  const auto start = std::chrono::steady_clock::now();
+  for (int i = 0; i < frames; ++i) {
+    fn();
+    asm volatile("" ::: "memory");
+  }
+  const std::chrono::duration<double, std::micro> elapsed = std::chrono::steady_clock::now() - start;
+  printf("%-32s %8.1f us/frame\n", name, elapsed.count() / frames);
+}
+
+int main() {
+  const size_t width = 240;
+  const size_t len = width * width;
+  std::vector<uint8_t> p8(len * 2), p4(len), row(width);
+  std::vector<uint32_t> rgb888(len), pair_lut(256);
+  std::vector<uint16_t> dst(len), lut(256);
+
+  srand(1);
+  for (auto& pixel : p8) pixel = rand() % 4 ? rand() : 0;
+  for (auto& pixel : p4) pixel = rand();
+  for (auto& pixel : rgb888) pixel = rand() & 0xFFFFFF;
+  for (auto& entry : lut) entry = to_rgb565(rand());
+  make_p4_pair_lut(pair_lut.data(), lut.data());
+
+  auto callback_path = [&](next_pixel_func next_pixel) {
+    uint8_t* out = (uint8_t*)dst.data();
+    frame_convert_rgb565([&out](void* data, size_t length) {
+      memcpy(out, data, length);
+      out += length;
+    }, next_pixel, len);
+  };
+
+  printf("bench_convert: %zux%zu to RGB565\n", width, width);
+
+  bench("P8 frame_convert callback", [&] {
+    const uint8_t* src = p8.data();
+    callback_path([&]() { return lut[*src++]; });
+  });
+  bench("P8 convert_p8_rgb565", [&] {
+    for (size_t y = 0; y < width; ++y) convert_p8_rgb565(dst.data() + y * width, p8.data() + y * width, width, lut.data());
+  });
+  bench("P8 2 layers composite_p8", [&] {
+    for (size_t y = 0; y < width; ++y) {
+      composite_p8(row.data(), p8.data() + y * width, width, len, 2);
+      convert_p8_rgb565(dst.data() + y * width, row.data(), width, lut.data());
+    }
+  });
+
+  bench("P4 frame_convert callback", [&] {
+    const uint8_t* src = p4.data();
+    bool odd = false;
+    callback_path([&]() {
+      const uint8_t index = odd ? *src++ & 0xF : *src >> 4;
+      odd = !odd;
+      return lut[index];
+    });
+  });
+  bench("P4 convert_p4_rgb565", [&] {
+    for (size_t y = 0; y < width; ++y) convert_p4_rgb565(dst.data() + y * width, p4.data() + y * width / 2, width, pair_lut.data());
+  });
+  bench("P4 2 layers composite_p4", [&] {
+    for (size_t y = 0; y < width; ++y) {
+      composite_p4(row.data(), p4.data() + y * width / 2, width, len / 2, 2);
+      convert_p8_rgb565(dst.data() + y * width, row.data(), width, lut.data());
+    }
+  });
+
+  bench("RGB888 frame_convert callback", [&] {
+    const uint32_t* src = rgb888.data();
+    callback_path([&]() { return to_rgb565(*src++); });
+  });
+  bench("RGB888 convert_rgb888_rgb565", [&] {
+    for (size_t y = 0; y < width; ++y) convert_rgb888_rgb565(dst.data() + y * width, rgb888.data() + y * width, width);
+  });
+  return 0;
+}
@@ -0,0 +1,105 @@
+// Checks composite_rgb565 against a pixel at a time reference.
+
+#include <cstdio>
+#include <cstdlib>
+#include <vector>
+
+#include "st7701_composite.hpp"
+
+using namespace pimoroni;
+
+// Values which catch mistakes in the word-wide transparency test
+static const uint16_t edge_values[] = {0x0000, 0x0001, 0x8000, 0x8001, 0x7FFF, 0xFFFF, 0x0100, 0x00FF};
+
+static uint16_t swap16(uint16_t pixel) {
+  return (pixel >> 8) | (pixel << 8);
+}
+
+static uint16_t reference_blend(uint16_t colour, uint16_t below, LayerOpacity opacity) {
+  colour = swap16(colour);
+  below = swap16(below);
+  if (opacity == OPACITY_50) {
+    colour = ((colour & 0xF7DE) >> 1) + ((below & 0xF7DE) >> 1);
+  } else {
+    colour = ((colour & 0xE79C) >> 2) + ((below & 0xF7DE) >> 1) + ((below & 0xE79C) >> 2);
+  }
+  return swap16(colour);
+}
+
+static void reference_rgb565(uint16_t* dst, const uint16_t* src, size_t len, size_t layer_offset, int layers, const LayerConfig* config) {
+  for (size_t i = 0; i < len; ++i) {
+    uint16_t colour = src[i];
+    for (int layer = 1; layer < layers; ++layer) {
+      const uint16_t above = src[i + layer * layer_offset];
+      const uint16_t key = config ? config[layer].key : 0;
+      const LayerOpacity opacity = config ? config[layer].opacity : OPACITY_100;
+      if (above == key) continue;
+      colour = opacity == OPACITY_100 ? above : reference_blend(above, colour, opacity);
+    }
+    dst[i] = colour;
+  }
+}
+
+static int failures = 0;
+
+static void check(const char* name, int layers, const std::vector<uint16_t>& expected, const std::vector<uint16_t>& actual) {
+  for (size_t i = 0; i < expected.size(); ++i) {
+    if (expected[i] != actual[i]) {
+      printf("FAIL %s, %d layers: pixel %zu is %04x, expected %04x\n", name, layers, i, actual[i], expected[i]);
+      ++failures;
+      return;
+    }
+  }
+}
+
+int main() {
+  const size_t len = 240 * 4;
+  std::vector<uint16_t> src(len * MAX_RGB565_LAYERS);
+  std::vector<uint16_t> expected(len), actual(len);
+
+  // Every pair of edge values in every pair of layers
+  const size_t num_edges = sizeof(edge_values) / sizeof(edge_values[0]);
+  for (size_t i = 0; i < len; ++i) {
+    src[i] = edge_values[i % num_edges];
+    src[i + len] = edge_values[(i / num_edges) % num_edges];
+    src[i + len * 2] = edge_values[(i / (num_edges * num_edges)) % num_edges];
+  }
+  for (int layers = 1; layers <= MAX_RGB565_LAYERS; ++layers) {
+    reference_rgb565(expected.data(), src.data(), len, len, layers, nullptr);
+    composite_rgb565(actual.data(), src.data(), len, len, layers);
+    check("edge values", layers, expected, actual);
+  }
+
+  LayerConfig keyed[MAX_RGB565_LAYERS];
+  keyed[1].key = 0x8000;
+  keyed[2].key = 0x0001;
+
+  LayerConfig blended[MAX_RGB565_LAYERS];
+  blended[1].opacity = OPACITY_50;
+  blended[2].key = 0xFFFF;
+  blended[2].opacity = OPACITY_25;
+
+  srand(1);
+  for (int trial = 0; trial < 100; ++trial) {
+    for (auto& pixel : src) {
+      const int choice = rand() % 8;
+      pixel = choice < 4 ? edge_values[rand() % num_edges] : rand();
+    }
+    for (int layers = 1; layers <= MAX_RGB565_LAYERS; ++layers) {
+      reference_rgb565(expected.data(), src.data(), len, len, layers, nullptr);
+      composite_rgb565(actual.data(), src.data(), len, len, layers);
+      check("random", layers, expected, actual);
+
+      reference_rgb565(expected.data(), src.data(), len, len, layers, keyed);
+      composite_rgb565(actual.data(), src.data(), len, len, layers, keyed);
+      check("keyed", layers, expected, actual);
+
+      reference_rgb565(expected.data(), src.data(), len, len, layers, blended);
+      composite_rgb565(actual.data(), src.data(), len, len, layers, blended);
+      check("blended", layers, expected, actual);
+    }
+  }
+
+  printf("test_composite: %s\n", failures ? "FAILED" : "ok");
+  return failures ? 1 : 0;
+}
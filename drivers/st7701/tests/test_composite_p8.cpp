@@ -0,0 +1,76 @@
+// Checks composite_p8 against the byte at a time compositor it replaced,
+// for every alignment of dst and src.
+
+#include <cstdio>
+#include <cstdlib>
+#include <vector>
+
+#include "st7701_composite.hpp"
+
+using namespace pimoroni;
+
+// The previous byte at a time loop from ST7701::update
+static void previous_p8(uint8_t* dst, const uint8_t* src, size_t len, size_t layer_offset, int layers, const LayerConfig* config) {
+  const uint8_t* end = dst + len;
+  uint8_t keys[MAX_LAYERS] = {0};
+  if (config) {
+    for (int layer = 1; layer < layers; ++layer) keys[layer] = config[layer].key;
+  }
+  while (dst != end) {
+    uint8_t colour = 0;
+    for (int layer = layers - 1; layer >= 0; --layer) {
+      colour = *(src + layer * layer_offset);
+      if (colour != keys[layer]) break;
+    }
+    *dst++ = colour;
+    ++src;
+  }
+}
+
+static int failures = 0;
+
+int main() {
+  const size_t layer_offset = 480;
+  const size_t lengths[] = {0, 1, 2, 3, 4, 5, 7, 8, 9, 15, 16, 17, 470, 476};
+
+  // Guard bytes around dst catch any write outside the requested pixels
+  std::vector<uint8_t> src(layer_offset * MAX_LAYERS);
+  std::vector<uint8_t> expected(layer_offset + 8), actual(layer_offset + 8);
+
+  LayerConfig keyed[MAX_LAYERS];
+  keyed[1].key = 3;
+  keyed[2].key = 0;
+  keyed[3].key = 0xFF;
+  keyed[4].key = 0x80;
+  keyed[5].key = 0x01;
+
+  srand(1);
+  for (int trial = 0; trial < 50; ++trial) {
+    for (auto& pixel : src) {
+      const int choice = rand() % 6;
+      pixel = choice == 0 ? 0 : choice == 1 ? 3 : choice == 2 ? 0xFF : choice == 3 ? 0x80 : rand();
+    }
+
+    for (int layers = 1; layers <= MAX_LAYERS; ++layers) {
+      for (int c = 0; c < 2; ++c) {
+        const LayerConfig* config = c ? keyed : nullptr;
+        for (size_t len : lengths) {
+          for (size_t dst_align = 0; dst_align < 4; ++dst_align) {
+            for (size_t src_align = 0; src_align < 4; ++src_align) {
+              std::fill(expected.begin(), expected.end(), 0xAA);
+              std::fill(actual.begin(), actual.end(), 0xAA);
+              previous_p8(expected.data() + dst_align, src.data() + src_align, len, layer_offset, layers, config);
+              composite_p8(actual.data() + dst_align, src.data() + src_align, len, layer_offset, layers, config);
+              if (expected != actual && failures++ < 10) {
+                printf("FAIL %d layers%s, len %zu, dst +%zu, src +%zu\n", layers, config ? " keyed" : "", len, dst_align, src_align);
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+
+  printf("test_composite_p8: %s\n", failures ? "FAILED" : "ok");
+  return failures ? 1 : 0;
+}
@@ -0,0 +1,93 @@
+// Checks the P4, P8 and RGB888 to RGB565 converters against a pixel at a time reference.
+
+#include <cstdio>
+#include <cstdlib>
+#include <vector>
+
+#include "st7701_composite.hpp"
+
+using namespace pimoroni;
+
+static uint16_t reference_rgb565(uint32_t colour) {
+  const uint16_t rgb565 = ((colour >> 8) & 0xF800) | ((colour >> 5) & 0x07E0) | ((colour >> 3) & 0x001F);
+  return (rgb565 >> 8) | (rgb565 << 8);
+}
+
+static uint8_t p4_pixel(const uint8_t* src, size_t i) {
+  return (i & 1) ? src[i >> 1] & 0xF : src[i >> 1] >> 4;
+}
+
+static int failures = 0;
+
+template<typename T> static void check(const char* name, const std::vector<T>& expected, const std::vector<T>& actual) {
+  for (size_t i = 0; i < expected.size(); ++i) {
+    if (expected[i] != actual[i]) {
+      printf("FAIL %s: pixel %zu is %x, expected %x\n", name, i, (unsigned)actual[i], (unsigned)expected[i]);
+      ++failures;
+      return;
+    }
+  }
+}
+
+int main() {
+  const size_t width = 240;
+  const size_t len = width * 4;
+  std::vector<uint8_t> p8(len * MAX_LAYERS), p4(len / 2 * MAX_LAYERS);
+  std::vector<uint32_t> rgb888(len * MAX_LAYERS);
+  std::vector<uint16_t> lut(256), expected(len), actual(len);
+  std::vector<uint8_t> expected_indices(len), actual_indices(len);
+  std::vector<uint32_t> pair_lut(256);
+
+  // Includes colours whose low bits are dropped, and pure black with junk in the top byte
+  const uint32_t edge_colours[] = {0x000000, 0xFFFFFF, 0x070307, 0x080408, 0xFF000000, 0xF8FCF8, 0x123456};
+
+  srand(1);
+  for (int trial = 0; trial < 100; ++trial) {
+    for (auto& entry : lut) entry = reference_rgb565(rand());
+    for (auto& pixel : p8) pixel = rand() % 4 ? rand() : 0;
+    for (auto& pixel : p4) pixel = rand() % 4 ? rand() : 0;
+    for (auto& pixel : rgb888) pixel = rand() % 4 ? edge_colours[rand() % 7] : rand() & 0xFFFFFF;
+    make_p4_pair_lut(pair_lut.data(), lut.data());
+
+    for (size_t i = 0; i < len; ++i) expected[i] = lut[p8[i]];
+    convert_p8_rgb565(actual.data(), p8.data(), len, lut.data());
+    check("convert_p8_rgb565", expected, actual);
+
+    for (size_t i = 0; i < len; ++i) expected[i] = lut[p4_pixel(p4.data(), i)];
+    convert_p4_rgb565(actual.data(), p4.data(), len, pair_lut.data());
+    check("convert_p4_rgb565", expected, actual);
+
+    for (int layers = 1; layers <= MAX_LAYERS; ++layers) {
+      // Black is transparent in every layer but the bottom one
+      for (size_t i = 0; i < len; ++i) {
+        uint32_t colour = 0;
+        for (int layer = layers - 1; layer >= 0; --layer) {
+          colour = rgb888[i + layer * len];
+          if (colour & 0xFFFFFF) break;
+        }
+        expected[i] = reference_rgb565(colour);
+      }
+      convert_rgb888_rgb565(actual.data(), rgb888.data(), len, len, layers);
+      check("convert_rgb888_rgb565", expected, actual);
+
+      LayerConfig keyed[MAX_LAYERS];
+      for (int layer = 1; layer < layers; ++layer) keyed[layer].key = layer;
+      for (int c = 0; c < 2; ++c) {
+        const LayerConfig* config = c ? keyed : nullptr;
+        for (size_t i = 0; i < len; ++i) {
+          uint8_t index = 0;
+          for (int layer = layers - 1; layer >= 0; --layer) {
+            index = p4_pixel(p4.data() + layer * len / 2, i);
+            if (index != (config && layer ? config[layer].key : 0)) break;
+          }
+          expected_indices[i] = index;
+        }
+        composite_p4(actual_indices.data(), p4.data(), len, len, layers, config);
+        check("composite_p4", expected_indices, actual_indices);
+      }
+    }
+  }
+
+  printf("test_convert: %s\n", failures ? "FAILED" : "ok");
+  return failures ? 1 : 0;
+}
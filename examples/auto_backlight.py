@@ -78,8 +78,8 @@ while True:
         # Lux normalised with the lower bounds capped at 0.1 to keep the screen on.
         lux_norm = max((lux_avg - LUX_MIN) / (LUX_MAX - LUX_MIN), 0.1)
 
-        # Set the backlight!
-        presto.set_backlight(lux_norm)
+        # Set the backlight! Fading to the new level hides the steps between readings.
+        presto.set_backlight(lux_norm, duration_ms=250)
 
         display.set_pen(FOREGROUND)
         display.text(f"Brightness Level: {round(lux_norm * 10)}", 10, CY + 100, WIDTH, 1)
@@ -225,8 +225,8 @@ class Application:
         display.clear()
         presto.update()
 
-        # Reset!
-        machine.reset()
+        # Soft reset, /ramfs and the running display survive this
+        machine.soft_reset()
 
 
 icons = [
@@ -4,29 +4,74 @@
 /***** Methods *****/
 
 MP_DEFINE_CONST_FUN_OBJ_1(Presto___del___obj, Presto___del__);
-MP_DEFINE_CONST_FUN_OBJ_2(Presto_update_obj, Presto_update);
+MP_DEFINE_CONST_FUN_OBJ_KW(Presto_update_obj, 2, Presto_update);
+MP_DEFINE_CONST_FUN_OBJ_2(Presto_update_async_obj, Presto_update_async);
+MP_DEFINE_CONST_FUN_OBJ_1(Presto_is_busy_obj, Presto_is_busy);
 MP_DEFINE_CONST_FUN_OBJ_KW(Presto_partial_update_obj, 5, Presto_partial_update);
-MP_DEFINE_CONST_FUN_OBJ_2(Presto_set_backlight_obj, Presto_set_backlight);
+MP_DEFINE_CONST_FUN_OBJ_3(Presto_partial_update_many_obj, Presto_partial_update_many);
+MP_DEFINE_CONST_FUN_OBJ_2(Presto_damage_tracking_obj, Presto_damage_tracking);
+MP_DEFINE_CONST_FUN_OBJ_2(Presto_resize_graphics_obj, Presto_resize_graphics);
+MP_DEFINE_CONST_FUN_OBJ_3(Presto_set_layer_key_obj, Presto_set_layer_key);
+MP_DEFINE_CONST_FUN_OBJ_3(Presto_set_layer_opacity_obj, Presto_set_layer_opacity);
+MP_DEFINE_CONST_FUN_OBJ_KW(Presto_cycle_palette_obj, 4, Presto_cycle_palette);
+MP_DEFINE_CONST_FUN_OBJ_KW(Presto_fade_palette_obj, 7, Presto_fade_palette);
+MP_DEFINE_CONST_FUN_OBJ_2(Presto_stop_palette_obj, Presto_stop_palette);
+MP_DEFINE_CONST_FUN_OBJ_2(Presto_set_scroll_obj, Presto_set_scroll);
+MP_DEFINE_CONST_FUN_OBJ_1(Presto_get_scroll_obj, Presto_get_scroll);
+MP_DEFINE_CONST_FUN_OBJ_2(Presto_set_line_table_obj, Presto_set_line_table);
+MP_DEFINE_CONST_FUN_OBJ_KW(Presto_stats_obj, 1, Presto_stats);
+MP_DEFINE_CONST_FUN_OBJ_1(Presto_frame_stats_obj, Presto_frame_stats);
+MP_DEFINE_CONST_FUN_OBJ_KW(Presto_set_backlight_obj, 2, Presto_set_backlight);
 MP_DEFINE_CONST_FUN_OBJ_2(Presto_auto_ambient_leds_obj, Presto_auto_ambient_leds);
+MP_DEFINE_CONST_FUN_OBJ_KW(Presto_set_ambient_zones_obj, 1, Presto_set_ambient_zones);
+MP_DEFINE_CONST_FUN_OBJ_KW(Presto_led_effect_obj, 2, Presto_led_effect);
 
 MP_DEFINE_CONST_FUN_OBJ_KW(Presto_set_led_rgb_obj, 5, Presto_set_led_rgb);
 MP_DEFINE_CONST_FUN_OBJ_KW(Presto_set_led_hsv_obj, 3, Presto_set_led_hsv);
+MP_DEFINE_CONST_FUN_OBJ_2(Presto_set_leds_obj, Presto_set_leds);
+MP_DEFINE_CONST_FUN_OBJ_KW(Presto_set_led_correction_obj, 1, Presto_set_led_correction);
 
 /***** Binding of Methods *****/
 
 static const mp_rom_map_elem_t Presto_locals_dict_table[] = {
     { MP_ROM_QSTR(MP_QSTR___del__), MP_ROM_PTR(&Presto___del___obj) },
     { MP_ROM_QSTR(MP_QSTR_update), MP_ROM_PTR(&Presto_update_obj) },
+    { MP_ROM_QSTR(MP_QSTR_update_async), MP_ROM_PTR(&Presto_update_async_obj) },
+    { MP_ROM_QSTR(MP_QSTR_is_busy), MP_ROM_PTR(&Presto_is_busy_obj) },
     { MP_ROM_QSTR(MP_QSTR_partial_update), MP_ROM_PTR(&Presto_partial_update_obj) },
+    { MP_ROM_QSTR(MP_QSTR_partial_update_many), MP_ROM_PTR(&Presto_partial_update_many_obj) },
+    { MP_ROM_QSTR(MP_QSTR_damage_tracking), MP_ROM_PTR(&Presto_damage_tracking_obj) },
+    { MP_ROM_QSTR(MP_QSTR_resize_graphics), MP_ROM_PTR(&Presto_resize_graphics_obj) },
+    { MP_ROM_QSTR(MP_QSTR_set_layer_key), MP_ROM_PTR(&Presto_set_layer_key_obj) },
+    { MP_ROM_QSTR(MP_QSTR_set_layer_opacity), MP_ROM_PTR(&Presto_set_layer_opacity_obj) },
+    { MP_ROM_QSTR(MP_QSTR_cycle_palette), MP_ROM_PTR(&Presto_cycle_palette_obj) },
+    { MP_ROM_QSTR(MP_QSTR_fade_palette), MP_ROM_PTR(&Presto_fade_palette_obj) },
+    { MP_ROM_QSTR(MP_QSTR_stop_palette), MP_ROM_PTR(&Presto_stop_palette_obj) },
+    { MP_ROM_QSTR(MP_QSTR_set_scroll), MP_ROM_PTR(&Presto_set_scroll_obj) },
+    { MP_ROM_QSTR(MP_QSTR_get_scroll), MP_ROM_PTR(&Presto_get_scroll_obj) },
+    { MP_ROM_QSTR(MP_QSTR_set_line_table), MP_ROM_PTR(&Presto_set_line_table_obj) },
+    { MP_ROM_QSTR(MP_QSTR_stats), MP_ROM_PTR(&Presto_stats_obj) },
+    { MP_ROM_QSTR(MP_QSTR_frame_stats), MP_ROM_PTR(&Presto_frame_stats_obj) },
     { MP_ROM_QSTR(MP_QSTR_set_backlight), MP_ROM_PTR(&Presto_set_backlight_obj) },
     { MP_ROM_QSTR(MP_QSTR_auto_ambient_leds), MP_ROM_PTR(&Presto_auto_ambient_leds_obj) },
+    { MP_ROM_QSTR(MP_QSTR_set_ambient_zones), MP_ROM_PTR(&Presto_set_ambient_zones_obj) },
+    { MP_ROM_QSTR(MP_QSTR_led_effect), MP_ROM_PTR(&Presto_led_effect_obj) },
     { MP_ROM_QSTR(MP_QSTR_set_led_rgb), MP_ROM_PTR(&Presto_set_led_rgb_obj) },
     { MP_ROM_QSTR(MP_QSTR_set_led_hsv), MP_ROM_PTR(&Presto_set_led_hsv_obj) },
+    { MP_ROM_QSTR(MP_QSTR_set_leds), MP_ROM_PTR(&Presto_set_leds_obj) },
+    { MP_ROM_QSTR(MP_QSTR_set_led_correction), MP_ROM_PTR(&Presto_set_led_correction_obj) },
 
     { MP_ROM_QSTR(MP_QSTR_WIDTH), MP_ROM_INT(WIDTH/2) },
     { MP_ROM_QSTR(MP_QSTR_HEIGHT), MP_ROM_INT(HEIGHT/2) },
     { MP_ROM_QSTR(MP_QSTR_FULL_WIDTH), MP_ROM_INT(WIDTH) },
     { MP_ROM_QSTR(MP_QSTR_FULL_HEIGHT), MP_ROM_INT(HEIGHT) },
+
+    { MP_ROM_QSTR(MP_QSTR_LED_NONE), MP_ROM_INT(0) },
+    { MP_ROM_QSTR(MP_QSTR_LED_BREATHE), MP_ROM_INT(1) },
+    { MP_ROM_QSTR(MP_QSTR_LED_RAINBOW), MP_ROM_INT(2) },
+    { MP_ROM_QSTR(MP_QSTR_LED_CHASE), MP_ROM_INT(3) },
+    { MP_ROM_QSTR(MP_QSTR_LED_FLASH), MP_ROM_INT(4) },
+    { MP_ROM_QSTR(MP_QSTR_LED_FADE), MP_ROM_INT(5) },
 };
 
 static MP_DEFINE_CONST_DICT(Presto_locals_dict, Presto_locals_dict_table);
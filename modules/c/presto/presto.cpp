@@ -4,6 +4,7 @@
 #include "ws2812.hpp"
 #include <cstdio>
 #include <cfloat>
+#include <cmath>
 
 
 #include "hardware/structs/ioqspi.h"
@@ -22,7 +23,7 @@ extern "C" {
 
 // MicroPython's GC heap will automatically resize, so we should just
 // statically allocate these in C++ to avoid fragmentation.
-__attribute__((section(".uninitialized_data"))) static uint16_t presto_buffer[WIDTH * HEIGHT];
+__attribute__((section(".uninitialized_data"), aligned(4))) static uint16_t presto_buffer[WIDTH * HEIGHT];
 __attribute__((section(".uninitialized_data"), aligned(1024))) static uint32_t presto_palette[256];
 
 void __printf_debug_flush() {
@@ -78,90 +79,594 @@ static _Presto_obj_t *presto_obj;
 
 static volatile bool exit_core1;
 
+// An update handed to core1 by update_async, cleared by core1 once it's complete
+static PicoGraphics* volatile async_update_graphics = nullptr;
+
+static void wait_for_async_update() {
+    while (async_update_graphics) __wfe();
+}
+
 // ST7701 must be allocated into SRAM (not PSRAM), so reserve a buffer
 // for it here - Presto_make_new will placement new into this buffer.
 __attribute__((section(".uninitialized_data"))) static uint32_t st7701_buffer[sizeof(ST7701) / sizeof(uint32_t)];
 
+// The panel is left running when Presto is torn down, including over a soft reset,
+// so that the next instance only needs to set up the pixel path for its layout.
+static ST7701* st7701_panel = nullptr;
+
+#define NUM_PALETTE_CYCLES 8
+
+enum PaletteCycleMode : uint8_t {
+    PALETTE_ROTATE,
+    PALETTE_FADE,
+};
+
+// A range of palette entries animated by core1 on every vsync
+typedef struct _Presto_palette_cycle_t {
+    bool active;
+    PaletteCycleMode mode;
+    bool reverse;
+    uint8_t start;
+    uint16_t count;
+    uint16_t period;
+    uint16_t frame;
+    RGB888 target;
+} _Presto_palette_cycle_t;
+
+static _Presto_palette_cycle_t palette_cycles[NUM_PALETTE_CYCLES];
+
+// The colours each faded entry started from
+static uint32_t palette_cycle_base[256];
+
+// Changes are handed to core1 with one request per slot, so a cycle is never modified
+// mid-frame and setting up several slots only waits if the same slot is set twice in a frame
+static _Presto_palette_cycle_t palette_cycle_requests[NUM_PALETTE_CYCLES];
+static volatile bool palette_cycle_pending[NUM_PALETTE_CYCLES];
+
+static void set_palette_cycle(int slot, const _Presto_palette_cycle_t &cycle) {
+    while (palette_cycle_pending[slot]) __wfe();
+    palette_cycle_requests[slot] = cycle;
+    __dmb();
+    palette_cycle_pending[slot] = true;
+}
+
+static void __no_inline_not_in_flash_func(update_palette_cycles)() {
+    uint32_t* palette = presto_palette;
+
+    bool changed = false;
+    for (int slot = 0; slot < NUM_PALETTE_CYCLES; ++slot) {
+        if (!palette_cycle_pending[slot]) continue;
+        _Presto_palette_cycle_t &cycle = palette_cycles[slot];
+
+        // A stopped fade is put back how it was found, after that
+        // update() takes care of restoring the range from the PicoGraphics palette.
+        if (cycle.active && cycle.mode == PALETTE_FADE) {
+            for (uint i = cycle.start; i < cycle.start + cycle.count; ++i) palette[i] = palette_cycle_base[i];
+        }
+
+        cycle = palette_cycle_requests[slot];
+        if (cycle.active && cycle.mode == PALETTE_FADE) {
+            for (uint i = cycle.start; i < cycle.start + cycle.count; ++i) palette_cycle_base[i] = palette[i];
+        }
+
+        palette_cycle_pending[slot] = false;
+        changed = true;
+    }
+
+    if (changed) {
+        // Slots may overlap, so build the locks from scratch and hand them over in one go
+        uint32_t locked[256 / 32] = {0};
+        for (auto &c : palette_cycles) {
+            if (!c.active) continue;
+            for (uint i = c.start; i < c.start + c.count; ++i) locked[i >> 5] |= 1u << (i & 31);
+        }
+        presto_obj->presto->set_palette_locks(locked);
+        __sev();
+    }
+
+    for (auto &cycle : palette_cycles) {
+        if (!cycle.active) continue;
+
+        uint32_t* first = palette + cycle.start;
+        uint32_t* last = first + cycle.count - 1;
+
+        if (cycle.mode == PALETTE_ROTATE) {
+            if (++cycle.frame < cycle.period) continue;
+            cycle.frame = 0;
+
+            if (cycle.reverse) {
+                const uint32_t t = *first;
+                for (uint32_t* p = first; p != last; ++p) p[0] = p[1];
+                *last = t;
+            } else {
+                const uint32_t t = *last;
+                for (uint32_t* p = last; p != first; --p) p[0] = p[-1];
+                *first = t;
+            }
+        } else {
+            // Fade to the target and back again over one period
+            if (++cycle.frame >= cycle.period) cycle.frame = 0;
+            int32_t t = (cycle.frame * 512) / cycle.period;
+            if (t > 256) t = 512 - t;
+
+            const int32_t tr = (cycle.target >> 16) & 0xFF;
+            const int32_t tg = (cycle.target >> 8) & 0xFF;
+            const int32_t tb = cycle.target & 0xFF;
+
+            const uint32_t* base = palette_cycle_base + cycle.start;
+            for (uint32_t* p = first; p <= last; ++p) {
+                const RGB888 colour = ST7701::decode_palette_colour(*base++);
+                const int32_t r = (colour >> 16) & 0xFF;
+                const int32_t g = (colour >> 8) & 0xFF;
+                const int32_t b = colour & 0xFF;
+                *p = ST7701::encode_palette_colour(RGB888(
+                    ((r + (((tr - r) * t) >> 8)) << 16) |
+                    ((g + (((tg - g) * t) >> 8)) << 8) |
+                    (b + (((tb - b) * t) >> 8))));
+            }
+        }
+    }
+}
+
+// Backlight fades are run by core1, which steps the level once per vsync.
+// A request packs the target level into the low byte and the duration in ms above it,
+// a newer request replaces one core1 hasn't picked up yet so core0 never has to wait.
+#define BACKLIGHT_REQUEST 0x80000000u
+// Over an hour, and still fits in 32-bit microseconds
+#define BACKLIGHT_MAX_DURATION_MS 0x3FFFFF
+
+static volatile uint32_t backlight_request = 0;
+
+// Only touched by core1, the level survives Presto being recreated along with the panel
+static uint8_t backlight_level = 0;
+static uint8_t backlight_from = 0;
+static uint8_t backlight_target = 0;
+static uint32_t backlight_start_us = 0;
+static uint32_t backlight_duration_us = 0;
+
+static void set_backlight_fade(uint8_t target, uint32_t duration_ms) {
+    backlight_request = BACKLIGHT_REQUEST | (duration_ms << 8) | target;
+}
+
+static void __no_inline_not_in_flash_func(update_backlight_fade)() {
+    const uint32_t now = time_us_32();
+
+    const uint32_t request = __atomic_exchange_n(&backlight_request, 0, __ATOMIC_RELAXED);
+    if (request) {
+        backlight_from = backlight_level;
+        backlight_target = request & 0xFF;
+        backlight_start_us = now;
+        backlight_duration_us = ((request & ~BACKLIGHT_REQUEST) >> 8) * 1000;
+    }
+
+    if (backlight_level == backlight_target) return;
+
+    // Fade linearly in brightness, set_backlight takes care of the perceptual curve
+    const uint32_t elapsed = now - backlight_start_us;
+    if (elapsed >= backlight_duration_us) {
+        backlight_level = backlight_target;
+    } else {
+        const int32_t delta = backlight_target - backlight_from;
+        backlight_level = backlight_from + (int32_t)(((int64_t)delta * elapsed) / backlight_duration_us);
+    }
+    presto_obj->presto->set_backlight(backlight_level);
+}
+
 #define NUM_LEDS 7
 
-// These must be tweaked together
+// Size of the default sample zones
 #define SAMPLE_RANGE 64
-#define LOG2_OF_SAMPLE_RANGE_SQUARED 12
 
-#define SAMPLE_SHIFT (LOG2_OF_SAMPLE_RANGE_SQUARED + 2)
-static void __no_inline_not_in_flash_func(update_backlight_leds)() {
-    const Point led_sample_locations[NUM_LEDS] = {
-        { presto_obj->width - SAMPLE_RANGE, presto_obj->height - SAMPLE_RANGE },
-        { presto_obj->width - SAMPLE_RANGE, (presto_obj->height - SAMPLE_RANGE)/2 },
-        { presto_obj->width - SAMPLE_RANGE, 0 },
-        { (presto_obj->width - SAMPLE_RANGE)/2, 0 },
-        { 0, 0 },
-        { 0, (presto_obj->height - SAMPLE_RANGE)/2 },
-        { 0, presto_obj->height - SAMPLE_RANGE }
-    };
+// The ambient LEDs each show the average colour of a zone of the screen,
+// sampling every stride'th pixel and row of it.
+typedef struct _Presto_ambient_zone_t {
+    uint16_t x, y, w, h;
+    uint32_t samples;
+} _Presto_ambient_zone_t;
+
+typedef struct _Presto_ambient_config_t {
+    uint8_t num_zones;
+    uint8_t stride;
+    _Presto_ambient_zone_t zones[NUM_LEDS];
+} _Presto_ambient_config_t;
+
+static _Presto_ambient_config_t ambient_config;
+
+// Running totals of each zone, kept apart from led_values so the manual colours survive ambient mode
+static _Presto_led_values_t ambient_totals[NUM_LEDS];
+
+// Changes are handed to core1 as with palette cycles, so zones never change mid-sample
+static _Presto_ambient_config_t ambient_config_request;
+static volatile bool ambient_config_pending = false;
+
+// Per-zone count of each palette index, so each entry is decoded once rather than per pixel
+static uint32_t ambient_histogram[256];
+
+static void set_ambient_zone(_Presto_ambient_config_t &config, int i, int x, int y, int w, int h) {
+    _Presto_ambient_zone_t &zone = config.zones[i];
+    zone.x = x;
+    zone.y = y;
+    zone.w = w;
+    zone.h = h;
+    zone.samples = ((w + config.stride - 1) / config.stride) * ((h + config.stride - 1) / config.stride);
+}
+
+static void set_default_ambient_zones(_Presto_ambient_config_t &config, int width, int height) {
+    // Blocks around the edge of the screen next to each LED
+    const int right = width - SAMPLE_RANGE;
+    const int bottom = height - SAMPLE_RANGE;
+    config.num_zones = NUM_LEDS;
+    set_ambient_zone(config, 0, right, bottom, SAMPLE_RANGE, SAMPLE_RANGE);
+    set_ambient_zone(config, 1, right, bottom / 2, SAMPLE_RANGE, SAMPLE_RANGE);
+    set_ambient_zone(config, 2, right, 0, SAMPLE_RANGE, SAMPLE_RANGE);
+    set_ambient_zone(config, 3, right / 2, 0, SAMPLE_RANGE, SAMPLE_RANGE);
+    set_ambient_zone(config, 4, 0, 0, SAMPLE_RANGE, SAMPLE_RANGE);
+    set_ambient_zone(config, 5, 0, bottom / 2, SAMPLE_RANGE, SAMPLE_RANGE);
+    set_ambient_zone(config, 6, 0, bottom, SAMPLE_RANGE, SAMPLE_RANGE);
+}
+
+static void set_ambient_config(const _Presto_ambient_config_t &config) {
+    while (ambient_config_pending) __wfe();
+    ambient_config_request = config;
+    __dmb();
+    ambient_config_pending = true;
+}
+
+enum LedEffectMode : uint8_t {
+    LED_NONE,
+    LED_BREATHE,
+    LED_RAINBOW,
+    LED_CHASE,
+    LED_FLASH,
+    LED_FADE,
+};
+
+// An animation of the LEDs run by core1 on every vsync, in place of the manual colours
+typedef struct _Presto_led_effect_t {
+    LedEffectMode mode;
+    uint8_t r, g, b;
+    uint16_t period;
+    uint16_t frame;
+} _Presto_led_effect_t;
+
+static _Presto_led_effect_t led_effect;
+
+// The colours last sent to the LEDs, which a fade starts from
+static _Presto_led_values_t led_output[NUM_LEDS];
+static _Presto_led_values_t led_fade_from[NUM_LEDS];
+
+// Changes are handed to core1 as with palette cycles
+static _Presto_led_effect_t led_effect_request;
+static volatile bool led_effect_pending = false;
+
+static void set_led_effect(const _Presto_led_effect_t &effect) {
+    while (led_effect_pending) __wfe();
+    led_effect_request = effect;
+    __dmb();
+    led_effect_pending = true;
+}
+
+// Colours from set_leds, copied over all at once so a frame never shows half of them
+static _Presto_led_values_t led_values_request[NUM_LEDS];
+static volatile bool led_values_pending = false;
+
+// Single LEDs are written straight to led_values, so they wait for set_leds values
+// that haven't been taken yet, or core1 would copy those over them out of order
+static void wait_for_led_values_request() {
+    while (led_values_pending) __wfe();
+}
+
+static void take_led_values_request() {
+    if (led_values_pending) {
+        memcpy(presto_obj->led_values, led_values_request, sizeof(led_values_request));
+        led_values_pending = false;
+        __sev();
+    }
+}
+
+// Gamma and white balance for each channel, applied to everything sent to the LEDs
+static uint8_t led_lut[3][256];
+static uint8_t led_lut_request[3][256];
+static volatile bool led_lut_pending = false;
+
+static void set_led_lut(float gamma[3], float white[3]) {
+    while (led_lut_pending) __wfe();
+    for (int c = 0; c < 3; ++c) {
+        for (int i = 0; i < 256; ++i) {
+            led_lut_request[c][i] = (uint8_t)(powf(i / 255.0f, gamma[c]) * white[c] * 255.0f + 0.5f);
+        }
+    }
+    __dmb();
+    led_lut_pending = true;
+}
+
+static void take_led_lut_request() {
+    if (led_lut_pending) {
+        memcpy(led_lut, led_lut_request, sizeof(led_lut));
+        led_lut_pending = false;
+        __sev();
+    }
+}
+
+static void show_led(int i, uint32_t r, uint32_t g, uint32_t b) {
+    if (r > 255) r = 255;
+    if (g > 255) g = 255;
+    if (b > 255) b = 255;
+    led_output[i] = {r, g, b};
+    presto_obj->ws2812->set_rgb(i, led_lut[0][r], led_lut[1][g], led_lut[2][b]);
+}
+
+// Fully saturated colour for a hue from 0 to 1535, scaled by the effect's colour
+static void show_led_hue(int i, uint32_t hue, const _Presto_led_effect_t &effect) {
+    const uint32_t f = hue & 0xFF;
+    uint32_t r, g, b;
+    switch ((hue >> 8) % 6) {
+        case 0: r = 255; g = f; b = 0; break;
+        case 1: r = 255 - f; g = 255; b = 0; break;
+        case 2: r = 0; g = 255; b = f; break;
+        case 3: r = 0; g = 255 - f; b = 255; break;
+        case 4: r = f; g = 0; b = 255; break;
+        default: r = 255; g = 0; b = 255 - f; break;
+    }
+    show_led(i, (r * effect.r) / 255, (g * effect.g) / 255, (b * effect.b) / 255);
+}
+
+static void take_led_effect_request() {
+    if (led_effect_pending) {
+        led_effect = led_effect_request;
+        if (led_effect.mode == LED_FADE) {
+            memcpy(led_fade_from, led_output, sizeof(led_fade_from));
+        }
+        led_effect_pending = false;
+        __sev();
+    }
+}
+
+// Returns true if an effect is running and has set the LEDs
+static bool update_led_effect() {
+    _Presto_led_effect_t &effect = led_effect;
+    if (effect.mode == LED_NONE) return false;
+
+    // Position through the period, from 0 to 255
+    const uint32_t t = (effect.frame * 256) / effect.period;
+
+    switch (effect.mode) {
+        case LED_BREATHE: {
+            // Up and down again once a period, squared so it looks even to the eye
+            uint32_t level = t < 128 ? t * 2 : (255 - t) * 2;
+            level = (level * level) >> 8;
+            for (int i = 0; i < NUM_LEDS; ++i) {
+                show_led(i, (effect.r * level) >> 8, (effect.g * level) >> 8, (effect.b * level) >> 8);
+            }
+            break;
+        }
+        case LED_RAINBOW:
+            // Spread the hues around the LEDs so the whole wheel is always on show
+            for (int i = 0; i < NUM_LEDS; ++i) {
+                show_led_hue(i, t * 6 + (i * 1536) / NUM_LEDS, effect);
+            }
+            break;
+        case LED_CHASE: {
+            const int lit = (t * NUM_LEDS) >> 8;
+            for (int i = 0; i < NUM_LEDS; ++i) {
+                if (i == lit) show_led(i, effect.r, effect.g, effect.b);
+                else show_led(i, 0, 0, 0);
+            }
+            break;
+        }
+        case LED_FLASH:
+            for (int i = 0; i < NUM_LEDS; ++i) {
+                if (t < 128) show_led(i, effect.r, effect.g, effect.b);
+                else show_led(i, 0, 0, 0);
+            }
+            break;
+        case LED_FADE:
+        default:
+            for (int i = 0; i < NUM_LEDS; ++i) {
+                const _Presto_led_values_t &from = led_fade_from[i];
+                show_led(i, from.r + (((int32_t)effect.r - (int32_t)from.r) * (int32_t)t >> 8),
+                            from.g + (((int32_t)effect.g - (int32_t)from.g) * (int32_t)t >> 8),
+                            from.b + (((int32_t)effect.b - (int32_t)from.b) * (int32_t)t >> 8));
+            }
+            break;
+    }
+
+    if (++effect.frame >= effect.period) {
+        effect.frame = 0;
+        if (effect.mode == LED_FADE) {
+            // Hold the target colour, which the manual colours take over from
+            for (int i = 0; i < NUM_LEDS; ++i) {
+                presto_obj->led_values[i] = {effect.r, effect.g, effect.b};
+            }
+            effect.mode = LED_NONE;
+        }
+    }
+
+    return true;
+}
+
+// A summary of the screen's content, sampled on a coarse grid by core1 once it's been asked for
+#define FRAME_SUMMARY_GRID 32
+#define FRAME_SUMMARY_BINS 16
+
+typedef struct _Presto_frame_summary_t {
+    uint8_t luma;
+    uint8_t r, g, b;
+    uint16_t histogram[FRAME_SUMMARY_BINS];
+} _Presto_frame_summary_t;
+
+// Core1 fills one summary while the other can be read
+static _Presto_frame_summary_t frame_summaries[2];
+static volatile int frame_summary_ready = -1;
+static volatile bool frame_summary_enabled = false;
+
+// Samples are counted into colour cubes, two bits per channel, to find the dominant colour
+typedef struct _Presto_colour_cube_t {
+    uint32_t count;
+    uint32_t r, g, b;
+} _Presto_colour_cube_t;
+
+static _Presto_colour_cube_t frame_summary_cubes[64];
+
+static void __no_inline_not_in_flash_func(update_frame_summary)() {
+    const uint16_t* front_buffer = presto_obj->presto->get_framebuffer();
+    const int width = presto_obj->width;
+    const int height = presto_obj->height;
+    const int step_x = width / FRAME_SUMMARY_GRID;
+    const int step_y = height / FRAME_SUMMARY_GRID;
+
+    const int index = frame_summary_ready == 0 ? 1 : 0;
+    _Presto_frame_summary_t &summary = frame_summaries[index];
+    memset(&summary, 0, sizeof(summary));
+    memset(frame_summary_cubes, 0, sizeof(frame_summary_cubes));
+
+    uint32_t luma_total = 0;
+    uint32_t samples = 0;
+    for (int y = step_y / 2; y < height; y += step_y) {
+        const int row = presto_obj->presto->get_scanout_row(y);
+        for (int x = step_x / 2; x < width; x += step_x) {
+            uint16_t sample;
+            if (presto_obj->using_palette) sample = presto_obj->presto->get_encoded_palette_entry(((uint8_t*)front_buffer)[row * width + x]) >> 16;
+            else sample = __builtin_bswap16(front_buffer[row * width + x]);
+            const uint32_t r = (sample >> 8) & 0xF8;
+            const uint32_t g = (sample >> 3) & 0xFC;
+            const uint32_t b = (sample << 3) & 0xF8;
+
+            // BT.601 luma, with weights out of 256
+            const uint32_t luma = (r * 77 + g * 150 + b * 29) >> 8;
+            luma_total += luma;
+            ++summary.histogram[luma >> 4];
+
+            _Presto_colour_cube_t &cube = frame_summary_cubes[((r >> 6) << 4) | ((g >> 6) << 2) | (b >> 6)];
+            ++cube.count;
+            cube.r += r;
+            cube.g += g;
+            cube.b += b;
+            ++samples;
+        }
+    }
 
+    summary.luma = luma_total / samples;
+
+    // The dominant colour is the average of the busiest cube
+    const _Presto_colour_cube_t* dominant = &frame_summary_cubes[0];
+    for (const auto &cube : frame_summary_cubes) {
+        if (cube.count > dominant->count) dominant = &cube;
+    }
+    summary.r = dominant->r / dominant->count;
+    summary.g = dominant->g / dominant->count;
+    summary.b = dominant->b / dominant->count;
+
+    frame_summary_ready = index;
+    __sev();
+}
+
+static void __no_inline_not_in_flash_func(update_backlight_leds)() {
     while (!exit_core1) {
+        if (ambient_config_pending) {
+            ambient_config = ambient_config_request;
+            memset(ambient_totals, 0, sizeof(ambient_totals));
+            ambient_config_pending = false;
+            __sev();
+        }
+
         if (presto_obj->auto_ambient_leds) {
-            for (int i = 0; i < NUM_LEDS; ++i) {
-                uint32_t r = presto_obj->led_values[i].r;
-                uint32_t g = presto_obj->led_values[i].g;
-                uint32_t b = presto_obj->led_values[i].b;
+            // This may not be presto_buffer if the display is page flipping
+            uint16_t* front_buffer = presto_obj->presto->get_framebuffer();
+            const int width = presto_obj->width;
+            const int stride = ambient_config.stride;
+
+            for (int i = 0; i < ambient_config.num_zones; ++i) {
+                const _Presto_ambient_zone_t &zone = ambient_config.zones[i];
+                uint32_t r = ambient_totals[i].r;
+                uint32_t g = ambient_totals[i].g;
+                uint32_t b = ambient_totals[i].b;
 
                 if (presto_obj->using_palette) {
-                    for (int y = 0; y < SAMPLE_RANGE; ++y) {
-                        uint8_t* ptr = (uint8_t*)presto_buffer;
-                        ptr += (led_sample_locations[i].y + y) * presto_obj->width + led_sample_locations[i].x;
-                        for (int x = 0; x < SAMPLE_RANGE; ++x) {
-                            uint16_t sample = presto_obj->presto->get_encoded_palette_entry(*ptr++) >> 16;
-                            r += (sample >> 8) & 0xF8;
-                            g += (sample >> 3) & 0xFC;
-                            b += (sample << 3) & 0xF8;
+                    memset(ambient_histogram, 0, sizeof(ambient_histogram));
+                    for (int y = 0; y < zone.h; y += stride) {
+                        const int row = presto_obj->presto->get_scanout_row(zone.y + y);
+                        const uint8_t* ptr = (uint8_t*)front_buffer + row * width + zone.x;
+                        for (int x = 0; x < zone.w; x += stride) {
+                            ++ambient_histogram[ptr[x]];
                         }
                     }
+                    for (int entry = 0; entry < 256; ++entry) {
+                        const uint32_t count = ambient_histogram[entry];
+                        if (!count) continue;
+                        uint16_t sample = presto_obj->presto->get_encoded_palette_entry(entry) >> 16;
+                        r += ((sample >> 8) & 0xF8) * count;
+                        g += ((sample >> 3) & 0xFC) * count;
+                        b += ((sample << 3) & 0xF8) * count;
+                    }
                 }
                 else {
-                    for (int y = 0; y < SAMPLE_RANGE; ++y) {
-                        uint16_t* ptr = &presto_buffer[(led_sample_locations[i].y + y) * presto_obj->width + led_sample_locations[i].x];
-                        for (int x = 0; x < SAMPLE_RANGE; ++x) {
-                            uint16_t sample = __builtin_bswap16(*ptr++);
+                    for (int y = 0; y < zone.h; y += stride) {
+                        const int row = presto_obj->presto->get_scanout_row(zone.y + y);
+                        const uint16_t* ptr = &front_buffer[row * width + zone.x];
+                        for (int x = 0; x < zone.w; x += stride) {
+                            uint16_t sample = __builtin_bswap16(ptr[x]);
                             r += (sample >> 8) & 0xF8;
                             g += (sample >> 3) & 0xFC;
                             b += (sample << 3) & 0xF8;
                         }
                     }
                 }
-                presto_obj->led_values[i].r = r;
-                presto_obj->led_values[i].g = g;
-                presto_obj->led_values[i].b = b;
+                ambient_totals[i].r = r;
+                ambient_totals[i].g = g;
+                ambient_totals[i].b = b;
             }
         }
 
+        if (frame_summary_enabled) update_frame_summary();
+
         presto_obj->presto->wait_for_vsync();
 
         if (exit_core1) break;
 
+        if (presto_obj->using_palette) update_palette_cycles();
+        update_backlight_fade();
+        take_led_effect_request();
+        take_led_values_request();
+        take_led_lut_request();
+
         // Note this section calls into code that executes from flash
         // It's important this is done during vsync to avoid artifacts,
         // hence the wait for vsync above.
         if (presto_obj->auto_ambient_leds) {
             for (int i = 0; i < NUM_LEDS; ++i) {
-                const uint32_t r = presto_obj->led_values[i].r;
-                const uint32_t g = presto_obj->led_values[i].g;
-                const uint32_t b = presto_obj->led_values[i].b;
-                presto_obj->ws2812->set_rgb(i, r >> SAMPLE_SHIFT, g >> SAMPLE_SHIFT, b >> SAMPLE_SHIFT);
-                presto_obj->led_values[i].r = (r * 3) >> 2;
-                presto_obj->led_values[i].g = (g * 3) >> 2;
-                presto_obj->led_values[i].b = (b * 3) >> 2;
+                if (i >= ambient_config.num_zones) {
+                    show_led(i, 0, 0, 0);
+                    continue;
+                }
+                const uint32_t r = ambient_totals[i].r;
+                const uint32_t g = ambient_totals[i].g;
+                const uint32_t b = ambient_totals[i].b;
+
+                // The running total settles at four times a frame's sum
+                const uint32_t scale = ambient_config.zones[i].samples * 4;
+                show_led(i, r / scale, g / scale, b / scale);
+                ambient_totals[i].r = (r * 3) >> 2;
+                ambient_totals[i].g = (g * 3) >> 2;
+                ambient_totals[i].b = (b * 3) >> 2;
             }
-        } else {
+        } else if (!update_led_effect()) {
             for (int i = 0; i < NUM_LEDS; ++i) {
                 const uint32_t r = presto_obj->led_values[i].r;
                 const uint32_t g = presto_obj->led_values[i].g;
                 const uint32_t b = presto_obj->led_values[i].b;
-                presto_obj->ws2812->set_rgb(i, r, g, b);
+                show_led(i, r, g, b);
             }
         }
         presto_obj->ws2812->update();
+
+        // Starting just after vsync lets the copy stay ahead of the scanout
+        PicoGraphics* graphics = async_update_graphics;
+        if (graphics) {
+            presto_obj->presto->update(graphics);
+            async_update_graphics = nullptr;
+            __sev();
+        }
     }
 
     multicore_fifo_push_blocking(1);
@@ -200,7 +705,12 @@ void presto_core1_entry() {
 
     ever_inited = true;
 
-    presto_obj->presto->init();
+    if (presto_obj->presto->is_running()) {
+        presto_obj->presto->init_pixels();
+    } else {
+        presto_obj->presto->init();
+        backlight_level = backlight_target = 255;
+    }
 
     multicore_fifo_push_blocking(0); // Todo handle issues here?*/
 
@@ -212,7 +722,9 @@ void presto_core1_entry() {
         }
     }
 
-    presto_obj->presto->cleanup();
+    // Stop the pixel path between frames, leaving the panel and timing running
+    presto_obj->presto->wait_for_vsync();
+    presto_obj->presto->cleanup_pixels();
 
     // Restore the original lockout handler and deinit.
     irq_remove_handler(SIO_IRQ_FIFO, presto_core1_lockout_handler);
@@ -231,38 +743,62 @@ mp_obj_t Presto_make_new(const mp_obj_type_t *type, size_t n_args, size_t n_kw,
     // Clean up any existing instance of Presto.
     (void)Presto___del__(mp_const_none);
 
-    enum { ARG_full_res, ARG_palette };
+    enum { ARG_full_res, ARG_palette, ARG_scale };
     static const mp_arg_t allowed_args[] = {
         { MP_QSTR_full_res, MP_ARG_BOOL, {.u_bool = false} },
         { MP_QSTR_palette, MP_ARG_BOOL, {.u_bool = false} },
+        { MP_QSTR_scale, MP_ARG_OBJ, {.u_obj = mp_const_none} },
     };
 
     // Parse args.
     mp_arg_val_t args[MP_ARRAY_SIZE(allowed_args)];
     mp_arg_parse_all_kw_array(n_args, n_kw, all_args, MP_ARRAY_SIZE(allowed_args), allowed_args, args);
 
+    // Each frame buffer pixel is shown as a scale x scale block on the panel
+    int scale = args[ARG_full_res].u_bool ? 1 : 2;
+    if (args[ARG_scale].u_obj != mp_const_none) {
+        scale = mp_obj_get_int(args[ARG_scale].u_obj);
+        if (scale < 1 || scale > 4) mp_raise_ValueError(MP_ERROR_TEXT("scale must be 1, 2, 3 or 4"));
+    }
+
     presto_debug("malloc self\n");
     self = mp_obj_malloc_with_finaliser(_Presto_obj_t, &Presto_type);
     presto_obj = self;
 
     presto_debug("set fb pointers\n");
 
-    if (!args[ARG_full_res].u_bool) {
-        self->width = WIDTH / 2;
-        self->height = HEIGHT / 2;
-    }
-    else {
-        self->width = WIDTH;
-        self->height = HEIGHT;
-    }
+    self->width = WIDTH / scale;
+    self->height = HEIGHT / scale;
 
     self->using_palette = args[ARG_palette].u_bool;
 
-    presto_debug("m_new_class(ST7701...\n");
-    self->presto = new (st7701_buffer) ST7701(self->width, self->height, ROTATE_0,
-        SPIPins{spi1, LCD_CS, LCD_CLK, LCD_DAT, PIN_UNUSED, LCD_DC, BACKLIGHT},
-        presto_buffer, self->using_palette ? presto_palette : nullptr,
-        LCD_D0);
+    memset(palette_cycles, 0, sizeof(palette_cycles));
+    for (auto &pending : palette_cycle_pending) pending = false;
+
+    led_effect.mode = LED_NONE;
+    led_effect_pending = false;
+    led_values_pending = false;
+    led_lut_pending = false;
+    frame_summary_enabled = false;
+    frame_summary_ready = -1;
+    for (int i = 0; i < 256; ++i) led_lut[0][i] = led_lut[1][i] = led_lut[2][i] = i;
+    memset(led_output, 0, sizeof(led_output));
+
+    ambient_config.stride = 2;
+    set_default_ambient_zones(ambient_config, self->width, self->height);
+    ambient_config_pending = false;
+
+    if (st7701_panel && st7701_panel->is_running()) {
+        presto_debug("reuse ST7701\n");
+        st7701_panel->set_layout(self->width, self->height, presto_buffer, self->using_palette ? presto_palette : nullptr);
+    } else {
+        presto_debug("m_new_class(ST7701...\n");
+        st7701_panel = new (st7701_buffer) ST7701(self->width, self->height, ROTATE_0,
+            SPIPins{spi1, LCD_CS, LCD_CLK, LCD_DAT, PIN_UNUSED, LCD_DC, BACKLIGHT},
+            presto_buffer, self->using_palette ? presto_palette : nullptr,
+            LCD_D0);
+    }
+    self->presto = st7701_panel;
 
     presto_debug("launch core1\n");
     multicore_reset_core1();
@@ -272,6 +808,7 @@ mp_obj_t Presto_make_new(const mp_obj_type_t *type, size_t n_args, size_t n_kw,
     WS2812::RGB* buffer = m_new(WS2812::RGB, NUM_LEDS);
     self->ws2812 = m_new_class(WS2812, NUM_LEDS, pio0, 3, LED_DAT, WS2812::DEFAULT_SERIAL_FREQ, false, WS2812::COLOR_ORDER::GRB, buffer);
     memset(self->led_values, 0, sizeof(self->led_values));
+    memset(ambient_totals, 0, sizeof(ambient_totals));
 
     // Micropython uses all of both scratch memory (and more!) for core0 stack, 
     // so we must supply our own small stack for core1 here.
@@ -291,11 +828,11 @@ mp_obj_t Presto_make_new(const mp_obj_type_t *type, size_t n_args, size_t n_kw,
 mp_int_t Presto_get_framebuffer(mp_obj_t self_in, mp_buffer_info_t *bufinfo, mp_uint_t flags) {
     _Presto_obj_t *self = MP_OBJ_TO_PTR2(self_in, _Presto_obj_t);
     (void)flags;
-    if(self->width == WIDTH / 2) {
+    if(self->width < WIDTH) {
         // Skip the first region, since it's used as the front-buffer
         bufinfo->buf = presto_buffer + (self->width * self->height);
-        // Return the remaining space, enough for three layers at 16bpp
-        bufinfo->len = self->width * self->height * 2 * 3;
+        // Return the remaining space, enough for three layers at 16bpp at half res, and more below that
+        bufinfo->len = (WIDTH * HEIGHT - self->width * self->height) * 2;
     } else if (self->using_palette) {
         // Full res palette mode, there is enough space for a single layer
         bufinfo->buf = (uint8_t*)presto_buffer + (self->width * self->height);
@@ -310,11 +847,39 @@ mp_int_t Presto_get_framebuffer(mp_obj_t self_in, mp_buffer_info_t *bufinfo, mp_
     return 0;
 }
 
-extern mp_obj_t Presto_update(mp_obj_t self_in, mp_obj_t graphics_in) {
-    _Presto_obj_t *self = MP_OBJ_TO_PTR2(self_in, _Presto_obj_t);
-    ModPicoGraphics_obj_t *picographics = MP_OBJ_TO_PTR2(graphics_in, ModPicoGraphics_obj_t);
+extern mp_obj_t Presto_update(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
+    enum { ARG_self, ARG_graphics, ARG_flip };
+    static const mp_arg_t allowed_args[] = {
+        { MP_QSTR_, MP_ARG_REQUIRED | MP_ARG_OBJ },
+        { MP_QSTR_graphics, MP_ARG_REQUIRED | MP_ARG_OBJ },
+        { MP_QSTR_flip, MP_ARG_BOOL, {.u_bool = false} }
+    };
+
+    // Parse args.
+    mp_arg_val_t args[MP_ARRAY_SIZE(allowed_args)];
+    mp_arg_parse_all(n_args, pos_args, kw_args, MP_ARRAY_SIZE(allowed_args), allowed_args, args);
+
+    _Presto_obj_t *self = MP_OBJ_TO_PTR2(args[ARG_self].u_obj, _Presto_obj_t);
+    ModPicoGraphics_obj_t *picographics = MP_OBJ_TO_PTR2(args[ARG_graphics].u_obj, ModPicoGraphics_obj_t);
+    PicoGraphics *graphics = picographics->graphics;
+
+    wait_for_async_update();
+
+    if (args[ARG_flip].u_bool) {
+        // Both buffers must live in presto_buffer, so that scanout never reads from PSRAM.
+        uint16_t* back_buffer = (uint16_t*)graphics->frame_buffer;
+        if (self->using_palette || graphics->pen_type != PicoGraphics::PEN_RGB565 || graphics->layers != 1 ||
+            back_buffer < presto_buffer || back_buffer + self->width * self->height > presto_buffer + WIDTH * HEIGHT) {
+            mp_raise_ValueError(MP_ERROR_TEXT("flip requires a single layer RGB565 display that is not full res"));
+        }
+        self->presto->flip(graphics);
+    } else {
+        self->presto->update(graphics);
 
-    self->presto->update(picographics->graphics);
+        if (self->presto->get_damage_tracking()) {
+            return mp_obj_new_int(self->presto->get_tiles_copied());
+        }
+    }
 
     return mp_const_none;
 }
@@ -341,19 +906,359 @@ extern mp_obj_t Presto_partial_update(size_t n_args, const mp_obj_t *pos_args, m
     int w = args[ARG_w].u_int;
     int h = args[ARG_h].u_int;
 
+    wait_for_async_update();
     self->presto->partial_update(picographics->graphics, {x, y, w, h});
 
     return mp_const_none;
 }
 
-mp_obj_t Presto_set_backlight(mp_obj_t self_in, mp_obj_t brightness) {
+extern mp_obj_t Presto_partial_update_many(mp_obj_t self_in, mp_obj_t graphics_in, mp_obj_t rects_in) {
+    _Presto_obj_t *self = MP_OBJ_TO_PTR2(self_in, _Presto_obj_t);
+    ModPicoGraphics_obj_t *picographics = MP_OBJ_TO_PTR2(graphics_in, ModPicoGraphics_obj_t);
+
+    Rect *regions = nullptr;
+    size_t count = 0;
+
+    mp_buffer_info_t bufinfo;
+    if (mp_get_buffer(rects_in, &bufinfo, MP_BUFFER_READ)) {
+        // A flat array('H') of x, y, w, h
+        if (bufinfo.typecode != 'H' || bufinfo.len % (4 * sizeof(uint16_t)) != 0) {
+            mp_raise_ValueError(MP_ERROR_TEXT("rects must be an array('H') of x, y, w, h"));
+        }
+        const uint16_t *values = (const uint16_t *)bufinfo.buf;
+        count = bufinfo.len / (4 * sizeof(uint16_t));
+        regions = m_new(Rect, count);
+        for (size_t i = 0; i < count; ++i) {
+            regions[i] = Rect(values[i * 4], values[i * 4 + 1], values[i * 4 + 2], values[i * 4 + 3]);
+        }
+    } else {
+        // A list or tuple of (x, y, w, h) tuples
+        mp_obj_t *items;
+        mp_obj_get_array(rects_in, &count, &items);
+        regions = m_new(Rect, count);
+        for (size_t i = 0; i < count; ++i) {
+            size_t len;
+            mp_obj_t *rect;
+            mp_obj_get_array(items[i], &len, &rect);
+            if (len != 4) mp_raise_ValueError(MP_ERROR_TEXT("rects must be (x, y, w, h)"));
+            regions[i] = Rect(mp_obj_get_int(rect[0]), mp_obj_get_int(rect[1]), mp_obj_get_int(rect[2]), mp_obj_get_int(rect[3]));
+        }
+    }
+
+    wait_for_async_update();
+    self->presto->partial_update(picographics->graphics, regions, count);
+
+    m_del(Rect, regions, count);
+
+    return mp_const_none;
+}
+
+extern mp_obj_t Presto_update_async(mp_obj_t self_in, mp_obj_t graphics_in) {
+    _Presto_obj_t *self = MP_OBJ_TO_PTR2(self_in, _Presto_obj_t);
+    ModPicoGraphics_obj_t *picographics = MP_OBJ_TO_PTR2(graphics_in, ModPicoGraphics_obj_t);
+    (void)self;
+
+    // Only one update can be in flight at a time
+    wait_for_async_update();
+
+    async_update_graphics = picographics->graphics;
+    __sev();
+
+    return mp_const_none;
+}
+
+extern mp_obj_t Presto_is_busy(mp_obj_t self_in) {
+    (void)self_in;
+    return mp_obj_new_bool(async_update_graphics != nullptr);
+}
+
+mp_obj_t Presto_damage_tracking(mp_obj_t self_in, mp_obj_t enable) {
+    _Presto_obj_t *self = MP_OBJ_TO_PTR2(self_in, _Presto_obj_t);
+
+    if(self->using_palette && mp_obj_is_true(enable)) {
+        mp_raise_ValueError(MP_ERROR_TEXT("damage tracking is not supported in palette mode"));
+    }
+
+    if(self->width % ST7701::DAMAGE_TILE_SIZE && mp_obj_is_true(enable)) {
+        mp_raise_ValueError(MP_ERROR_TEXT("damage tracking is not supported at this scale"));
+    }
+
+    self->presto->set_damage_tracking(mp_obj_is_true(enable));
+
+    return mp_const_none;
+}
+
+mp_obj_t Presto_resize_graphics(mp_obj_t self_in, mp_obj_t graphics_in) {
+    _Presto_obj_t *self = MP_OBJ_TO_PTR2(self_in, _Presto_obj_t);
+    ModPicoGraphics_obj_t *picographics = MP_OBJ_TO_PTR2(graphics_in, ModPicoGraphics_obj_t);
+    PicoGraphics *graphics = picographics->graphics;
+
+    // PicoGraphics only knows the half and full res sizes, so smaller scales are drawn
+    // by shrinking a half res PicoGraphics, its buffer is then more than big enough.
+    if(self->width > graphics->bounds.w || self->height > graphics->bounds.h) {
+        mp_raise_ValueError(MP_ERROR_TEXT("graphics is smaller than the display"));
+    }
+
+    graphics->bounds = Rect(0, 0, self->width, self->height);
+    graphics->clip = graphics->bounds;
+    graphics->set_layer(graphics->layer);
+
+    return mp_const_none;
+}
+
+static uint Presto_check_layer(_Presto_obj_t *self, mp_obj_t layer_in) {
+    int layer = mp_obj_get_int(layer_in);
+    int max_layers = self->using_palette ? MAX_LAYERS : MAX_RGB565_LAYERS;
+
+    // The bottom layer is always opaque
+    if(layer < 1 || layer >= max_layers) mp_raise_ValueError(MP_ERROR_TEXT("layer out of range"));
+
+    return layer;
+}
+
+mp_obj_t Presto_set_layer_key(mp_obj_t self_in, mp_obj_t layer_in, mp_obj_t key_in) {
+    _Presto_obj_t *self = MP_OBJ_TO_PTR2(self_in, _Presto_obj_t);
+
+    uint layer = Presto_check_layer(self, layer_in);
+    int key = mp_obj_get_int(key_in);
+
+    if(key < 0 || key > (self->using_palette ? 255 : 65535)) mp_raise_ValueError(MP_ERROR_TEXT("key out of range"));
+
+    self->presto->set_layer_config(layer, key, self->presto->get_layer_config(layer).opacity);
+
+    return mp_const_none;
+}
+
+mp_obj_t Presto_set_layer_opacity(mp_obj_t self_in, mp_obj_t layer_in, mp_obj_t opacity_in) {
+    _Presto_obj_t *self = MP_OBJ_TO_PTR2(self_in, _Presto_obj_t);
+
+    uint layer = Presto_check_layer(self, layer_in);
+    float o = mp_obj_get_float(opacity_in);
+
+    LayerOpacity opacity;
+    if(o == 1.0f) opacity = OPACITY_100;
+    else if(o == 0.5f) opacity = OPACITY_50;
+    else if(o == 0.25f) opacity = OPACITY_25;
+    else mp_raise_ValueError(MP_ERROR_TEXT("opacity must be 1.0, 0.5 or 0.25"));
+
+    if(self->using_palette && opacity != OPACITY_100) mp_raise_ValueError(MP_ERROR_TEXT("opacity is not supported in palette mode"));
+
+    self->presto->set_layer_config(layer, self->presto->get_layer_config(layer).key, opacity);
+
+    return mp_const_none;
+}
+
+static int Presto_check_palette_cycle(_Presto_obj_t *self, mp_obj_t slot_in) {
+    if(!self->using_palette) mp_raise_ValueError(MP_ERROR_TEXT("palette cycling requires palette mode"));
+
+    int slot = mp_obj_get_int(slot_in);
+    if(slot < 0 || slot >= NUM_PALETTE_CYCLES) mp_raise_ValueError(MP_ERROR_TEXT("slot out of range"));
+
+    return slot;
+}
+
+static void Presto_check_palette_range(int start, int count) {
+    if(start < 0 || count < 1 || start + count > 256) mp_raise_ValueError(MP_ERROR_TEXT("palette range out of range"));
+}
+
+mp_obj_t Presto_cycle_palette(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
+    enum { ARG_self, ARG_slot, ARG_start, ARG_count, ARG_period, ARG_reverse };
+    static const mp_arg_t allowed_args[] = {
+        { MP_QSTR_, MP_ARG_REQUIRED | MP_ARG_OBJ },
+        { MP_QSTR_slot, MP_ARG_REQUIRED | MP_ARG_OBJ },
+        { MP_QSTR_start, MP_ARG_REQUIRED | MP_ARG_INT },
+        { MP_QSTR_count, MP_ARG_REQUIRED | MP_ARG_INT },
+        { MP_QSTR_period, MP_ARG_INT, {.u_int = 1} },
+        { MP_QSTR_reverse, MP_ARG_BOOL, {.u_bool = false} },
+    };
+
+    // Parse args.
+    mp_arg_val_t args[MP_ARRAY_SIZE(allowed_args)];
+    mp_arg_parse_all(n_args, pos_args, kw_args, MP_ARRAY_SIZE(allowed_args), allowed_args, args);
+
+    _Presto_obj_t *self = MP_OBJ_TO_PTR2(args[ARG_self].u_obj, _Presto_obj_t);
+
+    int slot = Presto_check_palette_cycle(self, args[ARG_slot].u_obj);
+    int start = args[ARG_start].u_int;
+    int count = args[ARG_count].u_int;
+    int period = args[ARG_period].u_int;
+
+    Presto_check_palette_range(start, count);
+    if(period < 1 || period > 65535) mp_raise_ValueError(MP_ERROR_TEXT("period out of range"));
+
+    set_palette_cycle(slot, {true, PALETTE_ROTATE, args[ARG_reverse].u_bool, (uint8_t)start, (uint16_t)count, (uint16_t)period, 0, 0});
+
+    return mp_const_none;
+}
+
+mp_obj_t Presto_fade_palette(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
+    enum { ARG_self, ARG_slot, ARG_start, ARG_count, ARG_r, ARG_g, ARG_b, ARG_period };
+    static const mp_arg_t allowed_args[] = {
+        { MP_QSTR_, MP_ARG_REQUIRED | MP_ARG_OBJ },
+        { MP_QSTR_slot, MP_ARG_REQUIRED | MP_ARG_OBJ },
+        { MP_QSTR_start, MP_ARG_REQUIRED | MP_ARG_INT },
+        { MP_QSTR_count, MP_ARG_REQUIRED | MP_ARG_INT },
+        { MP_QSTR_r, MP_ARG_REQUIRED | MP_ARG_INT },
+        { MP_QSTR_g, MP_ARG_REQUIRED | MP_ARG_INT },
+        { MP_QSTR_b, MP_ARG_REQUIRED | MP_ARG_INT },
+        { MP_QSTR_period, MP_ARG_INT, {.u_int = 60} },
+    };
+
+    // Parse args.
+    mp_arg_val_t args[MP_ARRAY_SIZE(allowed_args)];
+    mp_arg_parse_all(n_args, pos_args, kw_args, MP_ARRAY_SIZE(allowed_args), allowed_args, args);
+
+    _Presto_obj_t *self = MP_OBJ_TO_PTR2(args[ARG_self].u_obj, _Presto_obj_t);
+
+    int slot = Presto_check_palette_cycle(self, args[ARG_slot].u_obj);
+    int start = args[ARG_start].u_int;
+    int count = args[ARG_count].u_int;
+    int period = args[ARG_period].u_int;
+
+    Presto_check_palette_range(start, count);
+    if(period < 2 || period > 65535) mp_raise_ValueError(MP_ERROR_TEXT("period out of range"));
+
+    RGB888 target = ((args[ARG_r].u_int & 0xFF) << 16) | ((args[ARG_g].u_int & 0xFF) << 8) | (args[ARG_b].u_int & 0xFF);
+
+    set_palette_cycle(slot, {true, PALETTE_FADE, false, (uint8_t)start, (uint16_t)count, (uint16_t)period, 0, target});
+
+    return mp_const_none;
+}
+
+mp_obj_t Presto_stop_palette(mp_obj_t self_in, mp_obj_t slot_in) {
+    _Presto_obj_t *self = MP_OBJ_TO_PTR2(self_in, _Presto_obj_t);
+
+    int slot = Presto_check_palette_cycle(self, slot_in);
+
+    set_palette_cycle(slot, {});
+
+    return mp_const_none;
+}
+
+mp_obj_t Presto_set_scroll(mp_obj_t self_in, mp_obj_t y_in) {
     _Presto_obj_t *self = MP_OBJ_TO_PTR2(self_in, _Presto_obj_t);
 
-    float b = mp_obj_get_float(brightness);
+    self->presto->set_scroll(mp_obj_get_int(y_in));
+
+    return mp_const_none;
+}
+
+mp_obj_t Presto_get_scroll(mp_obj_t self_in) {
+    _Presto_obj_t *self = MP_OBJ_TO_PTR2(self_in, _Presto_obj_t);
+
+    return mp_obj_new_int(self->presto->get_scroll());
+}
+
+mp_obj_t Presto_set_line_table(mp_obj_t self_in, mp_obj_t table_in) {
+    _Presto_obj_t *self = MP_OBJ_TO_PTR2(self_in, _Presto_obj_t);
+
+    if(table_in == mp_const_none) {
+        self->presto->set_line_table(nullptr);
+        return mp_const_none;
+    }
+
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(table_in, &bufinfo, MP_BUFFER_READ);
+    if(bufinfo.typecode != 'H' || bufinfo.len != ST7701::LINE_TABLE_SIZE * sizeof(uint16_t)) {
+        mp_raise_ValueError(MP_ERROR_TEXT("line table must be an array('H') of 480 rows"));
+    }
+
+    const uint16_t *rows = (const uint16_t *)bufinfo.buf;
+    for(int i = 0; i < ST7701::LINE_TABLE_SIZE; ++i) {
+        if(rows[i] >= self->height) mp_raise_ValueError(MP_ERROR_TEXT("line table row out of range"));
+    }
+
+    self->presto->set_line_table(rows);
+
+    return mp_const_none;
+}
+
+mp_obj_t Presto_stats(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
+    enum { ARG_self, ARG_reset, ARG_histogram };
+    static const mp_arg_t allowed_args[] = {
+        { MP_QSTR_, MP_ARG_REQUIRED | MP_ARG_OBJ },
+        { MP_QSTR_reset, MP_ARG_BOOL, {.u_bool = false} },
+        { MP_QSTR_histogram, MP_ARG_BOOL, {.u_bool = false} },
+    };
+
+    // Parse args.
+    mp_arg_val_t args[MP_ARRAY_SIZE(allowed_args)];
+    mp_arg_parse_all(n_args, pos_args, kw_args, MP_ARRAY_SIZE(allowed_args), allowed_args, args);
+
+    _Presto_obj_t *self = MP_OBJ_TO_PTR2(args[ARG_self].u_obj, _Presto_obj_t);
+
+    // Take a copy first, since the counters keep changing while the dict is built
+    const ST7701::FrameStats stats = self->presto->get_stats();
+    if (args[ARG_reset].u_bool) self->presto->reset_stats();
+
+    mp_obj_t result = mp_obj_new_dict(7);
+    mp_obj_dict_store(result, MP_OBJ_NEW_QSTR(MP_QSTR_frames), mp_obj_new_int_from_uint(stats.frames));
+    mp_obj_dict_store(result, MP_OBJ_NEW_QSTR(MP_QSTR_presents), mp_obj_new_int_from_uint(stats.presents));
+    mp_obj_dict_store(result, MP_OBJ_NEW_QSTR(MP_QSTR_update_us), mp_obj_new_int_from_uint(stats.update_us));
+    mp_obj_dict_store(result, MP_OBJ_NEW_QSTR(MP_QSTR_vsync_wait_us), mp_obj_new_int_from_uint(stats.vsync_wait_us));
+    mp_obj_dict_store(result, MP_OBJ_NEW_QSTR(MP_QSTR_beam_waits), mp_obj_new_int_from_uint(stats.beam_waits));
+    mp_obj_dict_store(result, MP_OBJ_NEW_QSTR(MP_QSTR_missed_vsyncs), mp_obj_new_int_from_uint(stats.missed_vsyncs));
+
+    if (args[ARG_histogram].u_bool) {
+        mp_obj_t intervals[ST7701::FRAME_INTERVAL_BINS];
+        for (int i = 0; i < ST7701::FRAME_INTERVAL_BINS; ++i) {
+            intervals[i] = mp_obj_new_int_from_uint(stats.intervals[i]);
+        }
+        mp_obj_dict_store(result, MP_OBJ_NEW_QSTR(MP_QSTR_intervals), mp_obj_new_tuple(ST7701::FRAME_INTERVAL_BINS, intervals));
+    }
+
+    return result;
+}
+
+mp_obj_t Presto_frame_stats(mp_obj_t self_in) {
+    (void)self_in;
+
+    // Sampling starts the first time it's asked for, so wait for the first summary
+    if (!frame_summary_enabled) {
+        frame_summary_enabled = true;
+        while (frame_summary_ready < 0) __wfe();
+    }
+
+    const _Presto_frame_summary_t summary = frame_summaries[frame_summary_ready];
+
+    mp_obj_t histogram[FRAME_SUMMARY_BINS];
+    for (int i = 0; i < FRAME_SUMMARY_BINS; ++i) {
+        histogram[i] = mp_obj_new_int(summary.histogram[i]);
+    }
+    mp_obj_t dominant[3] = {
+        mp_obj_new_int(summary.r),
+        mp_obj_new_int(summary.g),
+        mp_obj_new_int(summary.b),
+    };
+
+    mp_obj_t result = mp_obj_new_dict(3);
+    mp_obj_dict_store(result, MP_OBJ_NEW_QSTR(MP_QSTR_luma), mp_obj_new_int(summary.luma));
+    mp_obj_dict_store(result, MP_OBJ_NEW_QSTR(MP_QSTR_histogram), mp_obj_new_tuple(FRAME_SUMMARY_BINS, histogram));
+    mp_obj_dict_store(result, MP_OBJ_NEW_QSTR(MP_QSTR_dominant), mp_obj_new_tuple(3, dominant));
+
+    return result;
+}
+
+mp_obj_t Presto_set_backlight(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
+    enum { ARG_self, ARG_brightness, ARG_duration_ms };
+    static const mp_arg_t allowed_args[] = {
+        { MP_QSTR_, MP_ARG_REQUIRED | MP_ARG_OBJ },
+        { MP_QSTR_brightness, MP_ARG_REQUIRED | MP_ARG_OBJ },
+        { MP_QSTR_duration_ms, MP_ARG_INT, {.u_int = 0} },
+    };
+
+    // Parse args.
+    mp_arg_val_t args[MP_ARRAY_SIZE(allowed_args)];
+    mp_arg_parse_all(n_args, pos_args, kw_args, MP_ARRAY_SIZE(allowed_args), allowed_args, args);
+
+    float b = mp_obj_get_float(args[ARG_brightness].u_obj);
+    int duration_ms = args[ARG_duration_ms].u_int;
 
     if(b < 0 || b > 1.0f) mp_raise_ValueError(MP_ERROR_TEXT("brightness out of range. Expected 0.0 to 1.0"));
+    if(duration_ms < 0 || duration_ms > BACKLIGHT_MAX_DURATION_MS) mp_raise_ValueError(MP_ERROR_TEXT("duration_ms out of range"));
 
-    self->presto->set_backlight((uint8_t)(b * 255.0f));
+    // Even an immediate change goes via core1, so it can't be undone by a fade in progress
+    set_backlight_fade((uint8_t)(b * 255.0f), duration_ms);
 
     return mp_const_none;
 }
@@ -374,7 +1279,7 @@ mp_obj_t Presto_auto_ambient_leds(mp_obj_t self_in, mp_obj_t enable) {
     _Presto_obj_t *self = MP_OBJ_TO_PTR2(self_in, _Presto_obj_t);
 
     if(mp_obj_is_true(enable)) {
-        memset(self->led_values, 0, sizeof(self->led_values));
+        memset(ambient_totals, 0, sizeof(ambient_totals));
     }
 
     self->auto_ambient_leds = mp_obj_is_true(enable);
@@ -382,6 +1287,91 @@ mp_obj_t Presto_auto_ambient_leds(mp_obj_t self_in, mp_obj_t enable) {
     return mp_const_none;
 }
 
+mp_obj_t Presto_set_ambient_zones(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
+    enum { ARG_self, ARG_zones, ARG_stride };
+    static const mp_arg_t allowed_args[] = {
+        { MP_QSTR_, MP_ARG_REQUIRED | MP_ARG_OBJ },
+        { MP_QSTR_zones, MP_ARG_OBJ, {.u_obj = mp_const_none} },
+        { MP_QSTR_stride, MP_ARG_INT, {.u_int = 2} },
+    };
+
+    // Parse args.
+    mp_arg_val_t args[MP_ARRAY_SIZE(allowed_args)];
+    mp_arg_parse_all(n_args, pos_args, kw_args, MP_ARRAY_SIZE(allowed_args), allowed_args, args);
+
+    _Presto_obj_t *self = MP_OBJ_TO_PTR2(args[ARG_self].u_obj, _Presto_obj_t);
+
+    int stride = args[ARG_stride].u_int;
+    if(stride < 1 || stride > 64) mp_raise_ValueError(MP_ERROR_TEXT("stride out of range. Expected 1 to 64"));
+
+    _Presto_ambient_config_t config;
+    config.stride = stride;
+
+    if(args[ARG_zones].u_obj == mp_const_none) {
+        set_default_ambient_zones(config, self->width, self->height);
+    } else {
+        // A list or tuple of (x, y, w, h) tuples, one for each LED in turn
+        size_t count;
+        mp_obj_t *items;
+        mp_obj_get_array(args[ARG_zones].u_obj, &count, &items);
+        if(count > NUM_LEDS) mp_raise_ValueError(MP_ERROR_TEXT("too many zones, there are only 7 LEDs"));
+
+        config.num_zones = count;
+        for(size_t i = 0; i < count; ++i) {
+            size_t len;
+            mp_obj_t *zone;
+            mp_obj_get_array(items[i], &len, &zone);
+            if(len != 4) mp_raise_ValueError(MP_ERROR_TEXT("zones must be (x, y, w, h)"));
+            int x = mp_obj_get_int(zone[0]);
+            int y = mp_obj_get_int(zone[1]);
+            int w = mp_obj_get_int(zone[2]);
+            int h = mp_obj_get_int(zone[3]);
+            if(x < 0 || y < 0 || w < 1 || h < 1 || x + w > self->width || y + h > self->height) {
+                mp_raise_ValueError(MP_ERROR_TEXT("zone out of range"));
+            }
+            set_ambient_zone(config, i, x, y, w, h);
+        }
+    }
+
+    set_ambient_config(config);
+
+    return mp_const_none;
+}
+
+mp_obj_t Presto_led_effect(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
+    enum { ARG_self, ARG_effect, ARG_r, ARG_g, ARG_b, ARG_period };
+    static const mp_arg_t allowed_args[] = {
+        { MP_QSTR_, MP_ARG_REQUIRED | MP_ARG_OBJ },
+        { MP_QSTR_effect, MP_ARG_REQUIRED | MP_ARG_INT },
+        { MP_QSTR_r, MP_ARG_INT, {.u_int = 255} },
+        { MP_QSTR_g, MP_ARG_INT, {.u_int = 255} },
+        { MP_QSTR_b, MP_ARG_INT, {.u_int = 255} },
+        { MP_QSTR_period, MP_ARG_INT, {.u_int = 60} },
+    };
+
+    // Parse args.
+    mp_arg_val_t args[MP_ARRAY_SIZE(allowed_args)];
+    mp_arg_parse_all(n_args, pos_args, kw_args, MP_ARRAY_SIZE(allowed_args), allowed_args, args);
+
+    int effect = args[ARG_effect].u_int;
+    int period = args[ARG_period].u_int;
+
+    if(effect < LED_NONE || effect > LED_FADE) mp_raise_ValueError(MP_ERROR_TEXT("effect out of range"));
+    if(period < 1 || period > 65535) mp_raise_ValueError(MP_ERROR_TEXT("period out of range. Expected 1 to 65535"));
+
+    _Presto_led_effect_t request = {
+        .mode = (LedEffectMode)effect,
+        .r = (uint8_t)args[ARG_r].u_int,
+        .g = (uint8_t)args[ARG_g].u_int,
+        .b = (uint8_t)args[ARG_b].u_int,
+        .period = (uint16_t)period,
+        .frame = 0,
+    };
+    set_led_effect(request);
+
+    return mp_const_none;
+}
+
 mp_obj_t Presto_set_led_rgb(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
     enum { ARG_self, ARG_index, ARG_r, ARG_g, ARG_b };
     static const mp_arg_t allowed_args[] = {
@@ -398,6 +1388,7 @@ mp_obj_t Presto_set_led_rgb(size_t n_args, const mp_obj_t *pos_args, mp_map_t *k
 
     _Presto_obj_t *self = MP_OBJ_TO_PTR2(args[ARG_self].u_obj, _Presto_obj_t);
 
+    wait_for_led_values_request();
     self->led_values[args[ARG_index].u_int] = {(uint32_t)args[ARG_r].u_int, (uint32_t)args[ARG_g].u_int, (uint32_t)args[ARG_b].u_int};
 
     return mp_const_none;
@@ -410,6 +1401,24 @@ typedef struct _mp_obj_float_t {
 
 const mp_obj_float_t const_float_1 = {{&mp_type_float}, 1.0f};
 
+static _Presto_led_values_t led_from_hsv(float h, float s, float v) {
+    float i = floor(h * 6.0f);
+    float f = h * 6.0f - i;
+    v *= 255.0f;
+    uint8_t p = v * (1.0f - s);
+    uint8_t q = v * (1.0f - f * s);
+    uint8_t t = v * (1.0f - (1.0f - f) * s);
+
+    switch (int(i) % 6) {
+      case 0: return {(uint8_t)v, (uint8_t)t, (uint8_t)p};
+      case 1: return {(uint8_t)q, (uint8_t)v, (uint8_t)p};
+      case 2: return {(uint8_t)p, (uint8_t)v, (uint8_t)t};
+      case 3: return {(uint8_t)p, (uint8_t)q, (uint8_t)v};
+      case 4: return {(uint8_t)t, (uint8_t)p, (uint8_t)v};
+      default: return {(uint8_t)v, (uint8_t)p, (uint8_t)q};
+    }
+}
+
 mp_obj_t Presto_set_led_hsv(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
     enum { ARG_self, ARG_index, ARG_h, ARG_s, ARG_v };
     static const mp_arg_t allowed_args[] = {
@@ -431,22 +1440,83 @@ mp_obj_t Presto_set_led_hsv(size_t n_args, const mp_obj_t *pos_args, mp_map_t *k
     float s = mp_obj_get_float(args[ARG_s].u_obj);
     float v = mp_obj_get_float(args[ARG_v].u_obj);
 
-    float i = floor(h * 6.0f);
-    float f = h * 6.0f - i;
-    v *= 255.0f;
-    uint8_t p = v * (1.0f - s);
-    uint8_t q = v * (1.0f - f * s);
-    uint8_t t = v * (1.0f - (1.0f - f) * s);
+    wait_for_led_values_request();
+    self->led_values[index] = led_from_hsv(h, s, v);
 
-    switch (int(i) % 6) {
-      case 0: self->led_values[index] = {(uint8_t)v, (uint8_t)t, (uint8_t)p}; break;
-      case 1: self->led_values[index] = {(uint8_t)q, (uint8_t)v, (uint8_t)p}; break;
-      case 2: self->led_values[index] = {(uint8_t)p, (uint8_t)v, (uint8_t)t}; break;
-      case 3: self->led_values[index] = {(uint8_t)p, (uint8_t)q, (uint8_t)v}; break;
-      case 4: self->led_values[index] = {(uint8_t)t, (uint8_t)p, (uint8_t)v}; break;
-      case 5: self->led_values[index] = {(uint8_t)v, (uint8_t)p, (uint8_t)q}; break;
+    return mp_const_none;
+}
+
+mp_obj_t Presto_set_led_correction(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args) {
+    enum { ARG_self, ARG_gamma, ARG_r, ARG_g, ARG_b };
+    static const mp_arg_t allowed_args[] = {
+        { MP_QSTR_, MP_ARG_REQUIRED | MP_ARG_OBJ },
+        { MP_QSTR_gamma, MP_ARG_OBJ, {.u_rom_obj = MP_ROM_PTR(&const_float_1)} },
+        { MP_QSTR_r, MP_ARG_OBJ, {.u_rom_obj = MP_ROM_PTR(&const_float_1)} },
+        { MP_QSTR_g, MP_ARG_OBJ, {.u_rom_obj = MP_ROM_PTR(&const_float_1)} },
+        { MP_QSTR_b, MP_ARG_OBJ, {.u_rom_obj = MP_ROM_PTR(&const_float_1)} },
+    };
+
+    // Parse args.
+    mp_arg_val_t args[MP_ARRAY_SIZE(allowed_args)];
+    mp_arg_parse_all(n_args, pos_args, kw_args, MP_ARRAY_SIZE(allowed_args), allowed_args, args);
+
+    // Gamma is either one value for all channels, or an (r, g, b) tuple
+    float gamma[3];
+    if (mp_obj_is_float(args[ARG_gamma].u_obj) || mp_obj_is_int(args[ARG_gamma].u_obj)) {
+        gamma[0] = gamma[1] = gamma[2] = mp_obj_get_float(args[ARG_gamma].u_obj);
+    } else {
+        size_t len;
+        mp_obj_t *items;
+        mp_obj_get_array(args[ARG_gamma].u_obj, &len, &items);
+        if (len != 3) mp_raise_ValueError(MP_ERROR_TEXT("gamma must be a number or (r, g, b)"));
+        for (int c = 0; c < 3; ++c) gamma[c] = mp_obj_get_float(items[c]);
     }
 
+    float white[3] = {
+        mp_obj_get_float(args[ARG_r].u_obj),
+        mp_obj_get_float(args[ARG_g].u_obj),
+        mp_obj_get_float(args[ARG_b].u_obj),
+    };
+
+    for (int c = 0; c < 3; ++c) {
+        if (gamma[c] <= 0.0f || gamma[c] > 4.0f) mp_raise_ValueError(MP_ERROR_TEXT("gamma out of range. Expected 0.0 to 4.0"));
+        if (white[c] < 0.0f || white[c] > 1.0f) mp_raise_ValueError(MP_ERROR_TEXT("white balance out of range. Expected 0.0 to 1.0"));
+    }
+
+    set_led_lut(gamma, white);
+
+    return mp_const_none;
+}
+
+mp_obj_t Presto_set_leds(mp_obj_t self_in, mp_obj_t buf_in) {
+    (void)self_in;
+
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(buf_in, &bufinfo, MP_BUFFER_READ);
+
+    _Presto_led_values_t values[NUM_LEDS];
+
+    if (bufinfo.typecode == 'f') {
+        // An array('f') of h, s, v for each LED
+        if (bufinfo.len != NUM_LEDS * 3 * sizeof(float)) mp_raise_ValueError(MP_ERROR_TEXT("expected 7 h, s, v triples"));
+        const float *hsv = (const float *)bufinfo.buf;
+        for (int i = 0; i < NUM_LEDS; ++i) {
+            values[i] = led_from_hsv(hsv[i * 3], hsv[i * 3 + 1], hsv[i * 3 + 2]);
+        }
+    } else {
+        // Bytes of r, g, b for each LED
+        if (bufinfo.len != NUM_LEDS * 3) mp_raise_ValueError(MP_ERROR_TEXT("expected 7 r, g, b triples"));
+        const uint8_t *rgb = (const uint8_t *)bufinfo.buf;
+        for (int i = 0; i < NUM_LEDS; ++i) {
+            values[i] = {rgb[i * 3], rgb[i * 3 + 1], rgb[i * 3 + 2]};
+        }
+    }
+
+    wait_for_led_values_request();
+    memcpy(led_values_request, values, sizeof(values));
+    __dmb();
+    led_values_pending = true;
+
     return mp_const_none;
 }
 
@@ -469,6 +1539,8 @@ mp_obj_t Presto___del__(mp_obj_t self_in) {
         return mp_const_none;
     }
 
+    wait_for_async_update();
+
     presto_debug("stop core1\n");
     exit_core1 = true;
     __sev();
@@ -483,7 +1555,7 @@ mp_obj_t Presto___del__(mp_obj_t self_in) {
 
     presto_debug("core1 stopped\n");
 
-    presto_obj->presto->~ST7701();
+    // The ST7701 itself is kept, see st7701_panel
     presto_obj->presto = nullptr;
     presto_obj = nullptr;
     
@@ -18,13 +18,32 @@ extern const mp_obj_type_t Presto_type;
 
 /***** Extern of Class Methods *****/
 extern mp_obj_t Presto_make_new(const mp_obj_type_t *type, size_t n_args, size_t n_kw, const mp_obj_t *all_args);
-extern mp_obj_t Presto_update(mp_obj_t self_in, mp_obj_t graphics_in);
+extern mp_obj_t Presto_update(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args);
+extern mp_obj_t Presto_update_async(mp_obj_t self_in, mp_obj_t graphics_in);
+extern mp_obj_t Presto_is_busy(mp_obj_t self_in);
 extern mp_obj_t Presto_partial_update(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args);
+extern mp_obj_t Presto_partial_update_many(mp_obj_t self_in, mp_obj_t graphics_in, mp_obj_t rects_in);
 extern mp_int_t Presto_get_framebuffer(mp_obj_t self_in, mp_buffer_info_t *bufinfo, mp_uint_t flags);
-extern mp_obj_t Presto_set_backlight(mp_obj_t self_in, mp_obj_t brightness);
+extern mp_obj_t Presto_damage_tracking(mp_obj_t self_in, mp_obj_t enable);
+extern mp_obj_t Presto_resize_graphics(mp_obj_t self_in, mp_obj_t graphics_in);
+extern mp_obj_t Presto_set_layer_key(mp_obj_t self_in, mp_obj_t layer_in, mp_obj_t key_in);
+extern mp_obj_t Presto_set_layer_opacity(mp_obj_t self_in, mp_obj_t layer_in, mp_obj_t opacity_in);
+extern mp_obj_t Presto_cycle_palette(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args);
+extern mp_obj_t Presto_fade_palette(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args);
+extern mp_obj_t Presto_stop_palette(mp_obj_t self_in, mp_obj_t slot_in);
+extern mp_obj_t Presto_set_scroll(mp_obj_t self_in, mp_obj_t y_in);
+extern mp_obj_t Presto_get_scroll(mp_obj_t self_in);
+extern mp_obj_t Presto_set_line_table(mp_obj_t self_in, mp_obj_t table_in);
+extern mp_obj_t Presto_stats(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args);
+extern mp_obj_t Presto_frame_stats(mp_obj_t self_in);
+extern mp_obj_t Presto_set_backlight(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args);
 extern mp_obj_t Presto_auto_ambient_leds(mp_obj_t self_in, mp_obj_t enable);
+extern mp_obj_t Presto_set_ambient_zones(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args);
+extern mp_obj_t Presto_led_effect(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args);
 
 extern mp_obj_t Presto_set_led_rgb(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args);
 extern mp_obj_t Presto_set_led_hsv(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args);
+extern mp_obj_t Presto_set_leds(mp_obj_t self_in, mp_obj_t buf_in);
+extern mp_obj_t Presto_set_led_correction(size_t n_args, const mp_obj_t *pos_args, mp_map_t *kw_args);
 
 extern mp_obj_t Presto___del__(mp_obj_t self_in);
\ No newline at end of file
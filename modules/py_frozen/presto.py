@@ -1,4 +1,5 @@
 import asyncio
+from array import array
 from collections import namedtuple
 
 import _presto
@@ -34,26 +35,47 @@ class Presto():
     NUM_LEDS = 7
     LED_PIN = 33
 
-    def __init__(self, full_res=False, palette=False, ambient_light=False, direct_to_fb=False, layers=None):
+    LED_NONE = _presto.Presto.LED_NONE
+    LED_BREATHE = _presto.Presto.LED_BREATHE
+    LED_RAINBOW = _presto.Presto.LED_RAINBOW
+    LED_CHASE = _presto.Presto.LED_CHASE
+    LED_FLASH = _presto.Presto.LED_FLASH
+    LED_FADE = _presto.Presto.LED_FADE
+
+    def __init__(self, full_res=False, palette=False, ambient_light=False, direct_to_fb=False, layers=None, scale=None):
         # WiFi - *must* happen before Presto bringup
         # Note: Forces WiFi details to be in secrets.py
         self.wifi = EzWiFi()
 
+        # Scale is the size of each pixel on the panel, full_res is the same as scale=1
+        if scale is None:
+            scale = 1 if full_res else 2
+        full_res = scale == 1
+
         # Touch Input
-        self.touch = FT6236(full_res=full_res)
+        self.touch = FT6236(full_res=full_res, scale=scale)
 
         # Display Driver & PicoGraphics
         if layers is None:
             layers = 1 if full_res else 2
         pen = PEN_P8 if palette else PEN_RGB565
-        self.presto = _presto.Presto(full_res=full_res, palette=palette)
+        self.presto = _presto.Presto(palette=palette, scale=scale)
         self.buffer = None if (full_res and not palette and not direct_to_fb) else memoryview(self.presto)
-        self.display = PicoGraphics(DISPLAY_PRESTO_FULL_RES if full_res else DISPLAY_PRESTO, buffer=self.buffer, layers=layers, pen_type=pen)
-        self.width, self.height = self.display.get_bounds()
+        self._display = PicoGraphics(DISPLAY_PRESTO_FULL_RES if full_res else DISPLAY_PRESTO, buffer=self.buffer, layers=layers, pen_type=pen)
+        if scale > 2:
+            self.presto.resize_graphics(self._display)
+        self.width, self.height = self._display.get_bounds()
 
         if ambient_light:
             self.presto.auto_ambient_leds(True)
 
+    @property
+    def display(self):
+        # Core1 may still be reading the buffer, so don't hand it out for drawing until it's done
+        while self.presto.is_busy():
+            pass
+        return self._display
+
     @property
     def touch_a(self):
         return Touch(self.touch.x, self.touch.y, self.touch.state)
@@ -69,33 +91,106 @@ class Presto():
     async def async_connect(self):
         await self.wifi.connect()
 
-    def set_backlight(self, brightness):
-        self.presto.set_backlight(brightness)
+    def damage_tracking(self, enable):
+        self.presto.damage_tracking(enable)
+
+    def set_layer_key(self, layer, key):
+        self.presto.set_layer_key(layer, key)
+
+    def set_layer_opacity(self, layer, opacity):
+        self.presto.set_layer_opacity(layer, opacity)
+
+    def cycle_palette(self, slot, start, count, period=1, reverse=False):
+        self.presto.cycle_palette(slot, start, count, period=period, reverse=reverse)
+
+    def fade_palette(self, slot, start, count, r, g, b, period=60):
+        self.presto.fade_palette(slot, start, count, r, g, b, period=period)
+
+    def stop_palette(self, slot):
+        self.presto.stop_palette(slot)
+
+    def set_scroll(self, y):
+        self.presto.set_scroll(y)
+
+    def get_scroll(self):
+        return self.presto.get_scroll()
+
+    def scroll(self, dy):
+        # Treat the display as a ring buffer, returning the row to draw the dy revealed rows at
+        y = self.presto.get_scroll()
+        self.presto.set_scroll(y + dy)
+        return y if dy > 0 else (y + dy) % self.height
+
+    def line_table(self):
+        # The usual table, one frame buffer row for each of the panel's 480 lines
+        scale = _presto.Presto.FULL_HEIGHT // self.height
+        return array("H", (i // scale for i in range(_presto.Presto.FULL_HEIGHT)))
+
+    def set_line_table(self, table):
+        self.presto.set_line_table(table)
+
+    def stats(self, reset=False, histogram=False):
+        return self.presto.stats(reset=reset, histogram=histogram)
+
+    def frame_stats(self):
+        return self.presto.frame_stats()
+
+    def set_backlight(self, brightness, duration_ms=0):
+        self.presto.set_backlight(brightness, duration_ms=duration_ms)
 
     def auto_ambient_leds(self, enable):
         self.presto.auto_ambient_leds(enable)
 
+    def set_ambient_zones(self, zones=None, stride=2):
+        self.presto.set_ambient_zones(zones, stride=stride)
+
+    def led_effect(self, effect, r=255, g=255, b=255, period=60):
+        self.presto.led_effect(effect, r, g, b, period=period)
+
     def set_led_rgb(self, i, r, g, b):
         self.presto.set_led_rgb(i, r, g, b)
 
     def set_led_hsv(self, i, h, s, v):
         self.presto.set_led_hsv(i, h, s, v)
 
+    def set_leds(self, buf):
+        self.presto.set_leds(buf)
+
+    def set_led_correction(self, gamma=1.0, r=1.0, g=1.0, b=1.0):
+        self.presto.set_led_correction(gamma, r, g, b)
+
     def connect(self, ssid=None, password=None):
         return asyncio.get_event_loop().run_until_complete(self.wifi.connect(ssid, password))
 
     def touch_poll(self):
         self.touch.poll()
 
-    def update(self):
-        self.presto.update(self.display)
+    def update(self, flip=False):
+        tiles = self.presto.update(self._display, flip)
         self.touch.poll()
+        return tiles
+
+    def update_async(self):
+        self.presto.update_async(self._display)
+        self.touch.poll()
+        return self._wait_for_update()
+
+    async def _wait_for_update(self):
+        while self.presto.is_busy():
+            await asyncio.sleep_ms(1)
+
+    def is_busy(self):
+        return self.presto.is_busy()
 
     def partial_update(self, x, y, w, h):
-        self.presto.partial_update(self.display, x, y, w, h)
+        self.presto.partial_update(self._display, x, y, w, h)
+        self.touch.poll()
+
+    def partial_update_many(self, rects):
+        self.presto.partial_update_many(self._display, rects)
         self.touch.poll()
 
     def clear(self):
         self.display.clear()
-        self.presto.update(self.display)
+        self.presto.update(self._display)
 
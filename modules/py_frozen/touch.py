@@ -35,15 +35,15 @@ class FT6236:
     STATE_CONTACT = const(0b10)
     STATE_NONE = const(0b11)
 
-    def __init__(self, full_res=False, enable_interrupt=False):
+    def __init__(self, full_res=False, enable_interrupt=False, scale=None):
         self.debug = False
-        self._scale = 1 if full_res else 2
+        self._scale = scale or (1 if full_res else 2)
         self._irq = enable_interrupt
 
-        self.y = self.x = 240 if full_res else 120
+        self.y = self.x = 240 // self._scale
         self.state = False
 
-        self.y2 = self.x2 = 240 if full_res else 120
+        self.y2 = self.x2 = 240 // self._scale
         self.state2 = False
 
         self.distance = 0